@@ -2,14 +2,33 @@
 if "bpy" not in locals():
     import bpy
     import importlib
+    from . import channels
+    from . import cpu_render
+    from . import geometry
+    from . import png_utils
     from . import shader_utils
+    from . import stats
     from . import utils
+    from . import cli
+    from . import worker
     from . import ops
+    from . import preview
 else:
+    # 旧モジュールが保持するシェーダーと角のタイルを解放してから再読み込み
+    shader_utils.free_shader_cache()
+    cpu_render.clear_corner_tile_cache()
     # 最新のモジュールを再読み込み
+    importlib.reload(channels)
+    importlib.reload(cpu_render)
+    importlib.reload(geometry)
+    importlib.reload(png_utils)
     importlib.reload(shader_utils)
+    importlib.reload(stats)
     importlib.reload(utils)
+    importlib.reload(cli)
+    importlib.reload(worker)
     importlib.reload(ops)
+    importlib.reload(preview)
 
 
 bl_info = {
@@ -55,6 +74,60 @@ class BordermanProperties(bpy.types.PropertyGroup):
     prefix: bpy.props.StringProperty(
         default="枠線_"
     )  # type: ignore
+    # PNG Output
+    png_compress_level: bpy.props.IntProperty(
+        default=png_utils.DEFAULT_COMPRESS_LEVEL, min=0, max=9
+    )  # type: ignore
+    use_threaded_encode: bpy.props.BoolProperty(default=True)  # type: ignore
+    png_output_mode: bpy.props.EnumProperty(
+        name="Format",
+        description="Pixel format of border images",
+        items=[
+            (png_utils.PNG_MODE_INDEXED, "Indexed", "透明度付きのパレットで保存"),
+            (png_utils.PNG_MODE_RGBA, "RGBA", "8bitのRGBAで保存"),
+        ],
+        default=png_utils.PNG_MODE_INDEXED,
+    )  # type: ignore
+    # Rendering
+    render_backend: bpy.props.EnumProperty(
+        name="Backend",
+        description="Renderer used to generate border images",
+        items=[
+            (
+                utils.RENDER_BACKEND_AUTO,
+                "Auto",
+                "矩形はCPU、楕円はGPU(使えない場合はCPU)で描画",
+            ),
+            (utils.RENDER_BACKEND_GPU, "GPU", "GPUのシェーダーで描画"),
+            (utils.RENDER_BACKEND_CPU, "CPU", "NumPyで描画"),
+        ],
+        default=utils.RENDER_BACKEND_AUTO,
+    )  # type: ignore
+    use_atlas_render: bpy.props.BoolProperty(default=True)  # type: ignore
+    use_worker_processes: bpy.props.BoolProperty(
+        name="Worker Processes",
+        description="Render border images in background Blender processes",
+        default=False,
+    )  # type: ignore
+    worker_count: bpy.props.IntProperty(
+        default=worker.DEFAULT_WORKERS, min=1, max=64
+    )  # type: ignore
+    use_proxy_borders: bpy.props.BoolProperty(
+        name="Proxy Borders",
+        description="Create small border images for editing and full-resolution "
+        "images before render",
+        default=False,
+    )  # type: ignore
+    proxy_percentage: bpy.props.IntProperty(
+        subtype="PERCENTAGE", default=50, min=10, max=99
+    )  # type: ignore
+    # Stats
+    show_stats: bpy.props.BoolProperty(default=False)  # type: ignore
+    stats_sync_gpu: bpy.props.BoolProperty(
+        name="Sync GPU",
+        description="Wait for the GPU after each draw to include it in render time",
+        default=False,
+    )  # type: ignore
 
 
 class MainPanel(bpy.types.Panel):
@@ -75,6 +148,11 @@ class MainPanel(bpy.types.Panel):
         layout.label(text="Placeholder:")
         box = layout.box()
         box.operator(ops.AddPlaceholder.bl_idname)
+        box.operator(
+            preview.ToggleBorderPreview.bl_idname,
+            icon="HIDE_OFF" if preview.is_enabled() else "HIDE_ON",
+            depress=preview.is_enabled(),
+        )
         layout.separator()
 
         layout.label(text="Adding Border:")
@@ -90,11 +168,51 @@ class MainPanel(bpy.types.Panel):
         box.separator(factor=0.1)
         box.operator(ops.ReplaceSelectedPlaceholdersToBorder.bl_idname)
         box.operator(ops.ReplaceAllPlaceholdersToBorder.bl_idname)
+        box.separator(factor=0.1)
+        box.operator(ops.UpdateSelectedBorders.bl_idname)
+        box.operator(ops.UpdateAllBorders.bl_idname)
+        op = box.operator(
+            ops.UpdateSelectedBorders.bl_idname, text="Restyle selected borders"
+        )
+        op.use_panel_style = True
+        if props.use_proxy_borders:
+            box.separator(factor=0.1)
+            box.operator(ops.CreateFullResolutionBorders.bl_idname)
+            row = box.row(align=True)
+            row.operator(
+                ops.RenderWithFullResolutionBorders.bl_idname,
+                text="Render Image",
+                icon="RENDER_STILL",
+            )
+            op = row.operator(
+                ops.RenderWithFullResolutionBorders.bl_idname,
+                text="Render Animation",
+                icon="RENDER_ANIMATION",
+            )
+            op.animation = True
 
         layout.separator()
         layout.label(text="Maintenance:")
         box = layout.box()
         box.operator(ops.DeleteUnusedBorderImages.bl_idname)
+        op = box.operator(
+            ops.DeleteUnusedBorderImages.bl_idname, text="Find unused border images"
+        )
+        op.dry_run = True
+
+        layout.separator()
+        icon = "TRIA_DOWN" if props.show_stats else "TRIA_RIGHT"
+        layout.prop(props, "show_stats", text="Stats", icon=icon, emboss=False)
+        if props.show_stats:
+            box = layout.box()
+            lines = stats.get_stats().format_lines()
+            col = box.column(align=True)
+            for line in lines or ["No data"]:
+                col.label(text=line)
+            box.prop(props, "stats_sync_gpu")
+            row = box.row(align=True)
+            row.operator(ops.ResetStats.bl_idname, text="Reset")
+            row.operator(ops.ExportStats.bl_idname, text="Export JSON")
 
 
 class SettingsPanel(bpy.types.Panel):
@@ -124,10 +242,29 @@ class SettingsPanel(bpy.types.Panel):
         box.prop(props, "naming_rule", text="Naming Rule", expand=True)
         if props.naming_rule == "prefix":
             box.prop(props, "prefix", text="Prefix")
+        layout.label(text="PNG Output:")
+        box = layout.box()
+        box.prop(props, "png_output_mode", text="Format")
+        box.prop(props, "png_compress_level", text="Compression Level")
+        box.prop(props, "use_threaded_encode", text="Threaded Encode")
+        layout.label(text="Rendering:")
+        box = layout.box()
+        box.prop(props, "render_backend", text="Backend")
+        box.prop(props, "use_atlas_render", text="Batch Render (Atlas)")
+        box.prop(props, "use_worker_processes")
+        if props.use_worker_processes:
+            box.prop(props, "worker_count", text="Workers")
+        box.prop(props, "use_proxy_borders")
+        if props.use_proxy_borders:
+            box.prop(props, "proxy_percentage", text="Proxy Size")
 
 
 # アドオンで使用するために定義したクラス
-class_list = ops.class_list + [BordermanProperties, MainPanel, SettingsPanel]
+class_list = (
+    ops.class_list
+    + preview.class_list
+    + [BordermanProperties, MainPanel, SettingsPanel]
+)
 
 
 def register_props():
@@ -140,14 +277,37 @@ def unregister_props():
     del bpy.types.Scene.borderman_props
 
 
+# register()時にシェーダーを事前コンパイルするか
+WARM_UP_SHADERS_ON_REGISTER = True
+
+
+def warm_up_shaders():
+    # GPUコンテキストが利用できない場合は、初回描画時のコンパイルに任せる
+    try:
+        shader_utils.warm_up_shaders()
+    except Exception as e:
+        print(f"{bl_info['name']}: skip warming up shaders ({e})")
+    return None
+
+
 def register():
     for cls in class_list:
         bpy.utils.register_class(cls)
     register_props()
+    ops.register_handlers()
+    if WARM_UP_SHADERS_ON_REGISTER and not bpy.app.background:
+        # register()実行中はGPUコンテキストが無い場合があるため、タイマーで遅延実行
+        bpy.app.timers.register(warm_up_shaders, first_interval=0.1)
     print(f"{bl_info['name']} has been activated")
 
 
 def unregister():
+    if bpy.app.timers.is_registered(warm_up_shaders):
+        bpy.app.timers.unregister(warm_up_shaders)
+    preview.disable()
+    shader_utils.free_shader_cache()
+    cpu_render.clear_corner_tile_cache()
+    ops.unregister_handlers()
     unregister_props()
     for cls in class_list:
         bpy.utils.unregister_class(cls)
@@ -0,0 +1,191 @@
+# 枠線画像生成のベンチマーク
+#
+#   blender --background --factory-startup --python benchmarks/bench_borders.py -- \
+#       --count 20 --output bench.json
+#
+# 生成したシーンに N個のplaceholder × 解像度 × 形状 × 角の丸み を配置し、
+# アドオンと同じ置き換え処理(BorderReplaceJob)を実行して、
+# statsの段階ごとの処理時間とカウンター、ピークRSSをJSONで出力する。
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+borderman = importlib.import_module(os.path.basename(ADDON_DIR))
+ops = importlib.import_module(borderman.__name__ + ".ops")
+png_utils = importlib.import_module(borderman.__name__ + ".png_utils")
+shader_utils = importlib.import_module(borderman.__name__ + ".shader_utils")
+stats = importlib.import_module(borderman.__name__ + ".stats")
+utils = importlib.import_module(borderman.__name__ + ".utils")
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4K": (3840, 2160)}
+SHAPE_TYPES = (shader_utils.SHAPE_TYPE_RECTANGLE, shader_utils.SHAPE_TYPE_ELLIPSE)
+CORNER_RADII = (0, 40)
+BORDER_SIZE = 20
+BORDER_COLOR = (1.0, 0.0, 0.0, 1.0)
+
+
+def peak_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト、Linuxはキロバイト単位
+    return rss if platform.system() == "Darwin" else rss * 1024
+
+
+def make_scene(resolution, count):
+    scene = bpy.data.scenes.new("borderman_bench")
+    scene.render.resolution_x, scene.render.resolution_y = resolution
+    scene.render.resolution_percentage = 100
+    se = scene.sequence_editor_create()
+    placeholders = []
+    for i in range(count):
+        strip = se.strips.new_effect(
+            name=f"bench_{i:04}",
+            type="COLOR",
+            frame_start=1 + i * 10,
+            length=10,
+            channel=2,
+        )
+        # 大きさの異なるplaceholderを配置する
+        strip.transform.scale_x = 0.2 + 0.7 * (i % 8) / 7
+        strip.transform.scale_y = 0.2 + 0.7 * (i % 5) / 4
+        strip.transform.origin[0] = 0
+        strip.transform.origin[1] = 1.0
+        strip[ops.CUSTOM_KEY_GENERATER] = ops.ADDON_NAME
+        strip[ops.CUSTOM_KEY_STRIP_TYPE] = ops.STRIP_TYPE_PLACEHOLDER
+        strip[ops.CUSTOM_KEY_PLACEHOLDER_ID] = strip.name
+        placeholders.append(strip)
+    return scene, placeholders
+
+
+def run_case(resolution, shape_type, corner_radius, args, image_dir):
+    scene, placeholders = make_scene(resolution, args.count)
+    # アドオンの置き換え処理(BorderReplaceJob)をそのまま実行し、statsの段階ごとの
+    # 時間とカウンターを集計する
+    bench_stats = stats.get_stats()
+    bench_stats.reset()
+    bench_stats.sync_gpu = args.sync_gpu
+    # シェーダーの作成時間を含めるため、キャッシュを破棄しておく
+    shader_utils.free_shader_cache()
+    with bpy.context.temp_override(scene=scene):
+        job = ops.BorderReplaceJob(
+            bpy.context,
+            placeholders,
+            image_dir,
+            shape_type,
+            BORDER_COLOR,
+            BORDER_SIZE,
+            corner_radius,
+            args.compress_level,
+            args.pipeline,
+            args.atlas,
+            args.backend,
+            args.png_mode,
+            args.workers,
+        )
+        job.run()
+    result = bench_stats.to_dict()
+    bpy.data.scenes.remove(scene)
+    # 削除したシーンのアドレスが再利用される場合があるため、インデックスを破棄する
+    ops.invalidate_strip_indices()
+
+    return {
+        "resolution": resolution,
+        "shape_type": shape_type,
+        "corner_radius": corner_radius,
+        "count": args.count,
+        "backend": utils.resolve_render_backend(args.backend, shape_type),
+        "attached": job.attached,
+        "stages": result["stages"],
+        "counters": result["counters"],
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="bench_borders")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS))
+    parser.add_argument(
+        "--backend",
+        choices=(
+            utils.RENDER_BACKEND_AUTO,
+            utils.RENDER_BACKEND_GPU,
+            utils.RENDER_BACKEND_CPU,
+        ),
+        default=utils.RENDER_BACKEND_AUTO,
+    )
+    parser.add_argument(
+        "--png-mode",
+        choices=(png_utils.PNG_MODE_INDEXED, png_utils.PNG_MODE_RGBA),
+        default=png_utils.PNG_MODE_INDEXED,
+    )
+    parser.add_argument(
+        "--compress-level", type=int, default=png_utils.DEFAULT_COMPRESS_LEVEL
+    )
+    parser.add_argument("--no-pipeline", dest="pipeline", action="store_false")
+    parser.add_argument("--no-atlas", dest="atlas", action="store_false")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="number of worker processes"
+    )
+    parser.add_argument(
+        "--sync-gpu", action="store_true", help="include GPU time in render stage"
+    )
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    cases = []
+    with tempfile.TemporaryDirectory(prefix="borderman_bench_") as tmp_dir:
+        for name in args.resolutions:
+            for shape_type in SHAPE_TYPES:
+                radii = (
+                    CORNER_RADII
+                    if shape_type == shader_utils.SHAPE_TYPE_RECTANGLE
+                    else (0,)
+                )
+                for corner_radius in radii:
+                    # 既存の画像の共有(キャッシュ)で描画が省かれないよう、
+                    # ケースごとに別のディレクトリに書き出す
+                    image_dir = os.path.join(tmp_dir, f"case_{len(cases):03}")
+                    os.makedirs(image_dir)
+                    case = run_case(
+                        RESOLUTIONS[name], shape_type, corner_radius, args, image_dir
+                    )
+                    case["name"] = name
+                    cases.append(case)
+                    print(
+                        f"{name:>6} {shape_type:>9} r={corner_radius:<3} "
+                        + " ".join(
+                            f"{stage}={s['total']:.3f}s"
+                            for stage, s in case["stages"].items()
+                        )
+                    )
+
+    report = {
+        "blender": bpy.app.version_string,
+        "addon_version": ".".join(map(str, borderman.bl_info["version"])),
+        "backend": args.backend,
+        "png_mode": args.png_mode,
+        "pipeline": args.pipeline,
+        "atlas": args.atlas,
+        "workers": args.workers,
+        "cases": cases,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else [])
@@ -0,0 +1,83 @@
+# シーケンサーのチャンネルの空き区間の管理(bpyを使わない)
+import bisect
+import collections
+
+MAX_CHANNEL = 128
+
+
+class ChannelAllocator:
+    """Finds free sequencer channels from per-channel sorted frame intervals."""
+
+    def __init__(self, strips=()):
+        # チャンネル -> 開始フレーム順の区間[start, end)の開始/終了フレーム
+        #   同じチャンネルのストリップは重ならないため、終了フレームも昇順になる
+        self._starts = collections.defaultdict(list)
+        self._ends = collections.defaultdict(list)
+        self.reserve_many(
+            (strip.channel, strip.frame_final_start, strip.frame_final_end)
+            for strip in strips
+        )
+
+    def is_free(self, channel, frame_start, frame_end):
+        starts = self._starts.get(channel)
+        if not starts:
+            return True
+        # frame_endより前に始まる区間のうち、最後のものとだけ重なる可能性がある
+        i = bisect.bisect_left(starts, frame_end)
+        return i == 0 or self._ends[channel][i - 1] <= frame_start
+
+    def find_free_channel(self, frame_start, frame_end, target_channel):
+        # target_channel以上で、[frame_start, frame_end)が空いている最小のチャンネル
+        for channel in range(target_channel, MAX_CHANNEL + 1):
+            if self.is_free(channel, frame_start, frame_end):
+                return channel
+        return None
+
+    def reserve(self, channel, frame_start, frame_end):
+        starts = self._starts[channel]
+        i = bisect.bisect_left(starts, frame_start)
+        starts.insert(i, frame_start)
+        self._ends[channel].insert(i, frame_end)
+
+    def release(self, channel, frame_start, frame_end):
+        starts = self._starts.get(channel, [])
+        i = bisect.bisect_left(starts, frame_start)
+        ends = self._ends[channel]
+        while i < len(starts) and starts[i] == frame_start:
+            if ends[i] == frame_end:
+                del starts[i]
+                del ends[i]
+                return
+            i += 1
+
+    def reserve_many(self, intervals):
+        # (channel, frame_start, frame_end)をまとめて登録する
+        #   チャンネルごとに1回の整列で済ませ、1件ずつ挿入するより速い
+        for channel, added in _group_by_channel(intervals).items():
+            merged = list(zip(self._starts[channel], self._ends[channel])) + added
+            merged.sort()
+            self._starts[channel] = [start for start, _ in merged]
+            self._ends[channel] = [end for _, end in merged]
+
+    def release_many(self, intervals):
+        # (channel, frame_start, frame_end)をまとめて削除する
+        for channel, removed in _group_by_channel(intervals).items():
+            if channel not in self._starts:
+                continue
+            counts = collections.Counter(removed)
+            starts, ends = [], []
+            for interval in zip(self._starts[channel], self._ends[channel]):
+                if counts[interval] > 0:
+                    counts[interval] -= 1
+                    continue
+                starts.append(interval[0])
+                ends.append(interval[1])
+            self._starts[channel] = starts
+            self._ends[channel] = ends
+
+
+def _group_by_channel(intervals):
+    groups = collections.defaultdict(list)
+    for channel, frame_start, frame_end in intervals:
+        groups[channel].append((frame_start, frame_end))
+    return groups
@@ -0,0 +1,179 @@
+# バックグラウンド実行用のエントリーポイント
+#
+# Blender内での実行(1ファイル):
+#   blender -b project.blend --python-expr \
+#       "import borderman.cli as cli; cli.main()" -- [--no-cleanup] [--no-save]
+#
+# 複数の.blendファイルの一括処理(Blenderを並列に起動する):
+#   python borderman/cli.py --blender /path/to/blender --jobs 4 path/to/blend_dir
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+
+RESULT_PREFIX = "BORDERMAN_RESULT "
+
+
+def _ensure_registered():
+    import bpy
+
+    # --factory-startupなどでアドオンが有効でない場合は登録する
+    if not hasattr(bpy.types.Scene, "borderman_props"):
+        import importlib
+
+        importlib.import_module(__package__).register()
+
+
+def replace_placeholders_in_scene(scene, cleanup=True):
+    import bpy
+    from . import ops
+    from . import utils
+
+    result = {"scene": scene.name, "placeholders": 0, "deleted_images": 0}
+    if not scene.sequence_editor:
+        return result
+    props = scene.borderman_props
+    image_dir = utils.normalize_image_dir(props.image_dir)
+    if not image_dir:
+        raise RuntimeError("image_dir is not set or the .blend file is not saved")
+    os.makedirs(image_dir, exist_ok=True)
+
+    with bpy.context.temp_override(scene=scene):
+        placeholders = ops.get_indexed_strips(
+            scene, ops.STRIP_TYPE_PLACEHOLDER, top_level_only=True
+        )
+        result["placeholders"] = len(placeholders)
+        if placeholders:
+            # レンダリング用の出力のため、プロキシ画像ではなくフル解像度の画像を作成する
+            job = ops.BorderReplaceJob.from_props(
+                bpy.context, placeholders, image_dir, props, proxy_scale=1.0
+            )
+            job.run()
+    if cleanup:
+        count, _ = utils.sweep_unused_images(image_dir)
+        result["deleted_images"] = count
+    return result
+
+
+def run_in_blender(argv):
+    import bpy
+
+    parser = argparse.ArgumentParser(prog="borderman.cli")
+    parser.add_argument("--no-cleanup", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--all-scenes", action="store_true")
+    args = parser.parse_args(argv)
+
+    _ensure_registered()
+    started = time.perf_counter()
+    scenes = bpy.data.scenes if args.all_scenes else [bpy.context.scene]
+    results = [
+        replace_placeholders_in_scene(scene, cleanup=not args.no_cleanup)
+        for scene in scenes
+    ]
+    if not args.no_save:
+        bpy.ops.wm.save_mainfile()
+    summary = {
+        "file": bpy.data.filepath,
+        "scenes": results,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    print(RESULT_PREFIX + json.dumps(summary, ensure_ascii=False))
+    return summary
+
+
+def blender_command(blender, blend_path, extra_args, module="cli"):
+    # アドオンのディレクトリの親をsys.pathに追加し、パッケージとして読み込む
+    #   blend_pathがNoneの場合は、ファイルを開かずにmoduleのmain()を実行する
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    module_name = f"{os.path.basename(addon_dir)}.{module}"
+    expr = (
+        "import sys, importlib;"
+        f"sys.path.insert(0, {os.path.dirname(addon_dir)!r});"
+        f"importlib.import_module({module_name!r}).main()"
+    )
+    return [
+        blender,
+        "--background",
+        "--factory-startup",
+        *([blend_path] if blend_path else []),
+        "--python-expr",
+        expr,
+        "--",
+        *extra_args,
+    ]
+
+
+def run_file(blender, blend_path, extra_args):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        blender_command(blender, blend_path, extra_args),
+        capture_output=True,
+        text=True,
+    )
+    result = {
+        "file": blend_path,
+        "returncode": proc.returncode,
+        "seconds": round(time.perf_counter() - started, 3),
+        "placeholders": 0,
+    }
+    summary = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            summary = json.loads(line[len(RESULT_PREFIX) :])
+    if summary:
+        result["placeholders"] = sum(s["placeholders"] for s in summary["scenes"])
+    if proc.returncode != 0 or summary is None:
+        lines = proc.stderr.strip().splitlines()
+        result["error"] = lines[-1] if lines else "no result from blender"
+        result["returncode"] = proc.returncode or 1
+    return result
+
+
+def run_driver(argv):
+    parser = argparse.ArgumentParser(
+        description="Replace placeholders in every .blend file of a directory."
+    )
+    parser.add_argument("blend_dir")
+    parser.add_argument("--blender", default="blender")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args, extra_args = parser.parse_known_args(argv)
+
+    blend_files = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(args.blend_dir)
+        for name in names
+        if name.endswith(".blend")
+    )
+    started = time.perf_counter()
+    # 各スレッドが1つのBlenderプロセスを起動して完了を待つ
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        results = list(
+            executor.map(lambda f: run_file(args.blender, f, extra_args), blend_files)
+        )
+    total = round(time.perf_counter() - started, 3)
+
+    if args.json:
+        print(json.dumps({"files": results, "seconds": total}, ensure_ascii=False))
+    else:
+        for r in results:
+            status = "ok" if r["returncode"] == 0 else f"error: {r['error']}"
+            print(
+                f"{r['seconds']:8.2f}s  {r['placeholders']:5d}  {r['file']}  {status}"
+            )
+        print(f"{total:8.2f}s  total ({len(results)} files, {args.jobs} jobs)")
+    return 0 if all(r["returncode"] == 0 for r in results) else 1
+
+
+def main():
+    # Blender内では`--`以降の引数を使う
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    return run_in_blender(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run_driver(sys.argv[1:]))
@@ -0,0 +1,184 @@
+# GPUを使わずにNumPyで枠線画像を描画する
+#   shader_utilsのGLSLと同じ符号付き距離関数(SDF)をピクセル単位で評価する
+import numpy as np
+
+SHAPE_TYPE_RECTANGLE = "rectangle"
+# 一度に評価する行数(メモリ使用量を抑えるため)
+DEFAULT_TILE_ROWS = 256
+
+
+def sd_box(px, py, half_w, half_h, r):
+    # from https://iquilezles.org/articles/distfunctions2d/
+    dx = np.abs(px) - half_w + r
+    dy = np.abs(py) - half_h + r
+    outside = np.hypot(np.maximum(dx, 0.0), np.maximum(dy, 0.0))
+    inside = np.minimum(np.maximum(dx, dy), 0.0)
+    return outside + inside - r
+
+
+def sd_ellipse(px, py, a, b):
+    # from https://iquilezles.org/articles/ellipsedist/
+    # symmetry
+    px = np.abs(px)
+    py = np.abs(py)
+
+    # initial value
+    qx = a * (px - a)
+    qy = b * (py - b)
+    n = np.float32(1 / np.hypot(1.0, 0.01))
+    cs_x = np.where(qx < qy, np.float32(0.01) * n, n)
+    cs_y = np.where(qx < qy, n, np.float32(0.01) * n)
+
+    # find root with Newton solver
+    for _ in range(5):
+        ux = a * cs_x
+        uy = b * cs_y
+        vx = -a * cs_y
+        vy = b * cs_x
+        dx = px - ux
+        dy = py - uy
+        ta = dx * vx + dy * vy
+        tc = dx * ux + dy * uy + vx * vx + vy * vy
+        tb = np.sqrt(np.maximum(tc * tc - ta * ta, 0.0))
+        cs_x, cs_y = (cs_x * tb - cs_y * ta) / tc, (cs_y * tb + cs_x * ta) / tc
+
+    # compute final point and distance
+    d = np.hypot(px - a * cs_x, py - b * cs_y)
+
+    # return signed distance
+    outside = (px / a) ** 2 + (py / b) ** 2 > 1.0
+    return np.where(outside, d, -d)
+
+
+def to_ubyte_color(border_color):
+    return np.array(
+        [min(max(round(c * 255), 0), 255) for c in border_color], dtype=np.uint8
+    )
+
+
+# (border_size, 角の丸み, 色) -> 角のタイル
+_corner_tile_cache = {}
+
+
+def get_corner_tile(border_size, corner_radius, color):
+    """Returns the cached (n, n, 4) corner tile of a rounded-rectangle border.
+
+    Index ``[ky, kx]`` is the pixel ``ky`` rows and ``kx`` columns away from
+    the nearest horizontal and vertical edges.
+    """
+    key = (border_size, corner_radius, color.tobytes())
+    tile = _corner_tile_cache.get(key)
+    if tile is None:
+        # 角の丸みはGPUでの描画(オフスクリーンの1/2スケール)と合わせる
+        r = np.float32(corner_radius / 2)
+        n = int(np.ceil(r))
+        # 辺からの距離(ピクセルの中心)。sd_boxの|p| - bと同じ値になる
+        e = np.arange(n, dtype=np.float32) + np.float32(0.5)
+        ex, ey = np.meshgrid(e, e)
+        dx = r - ex
+        dy = r - ey
+        outside = np.hypot(np.maximum(dx, 0.0), np.maximum(dy, 0.0))
+        inside = np.minimum(np.maximum(dx, dy), 0.0)
+        d = outside + inside - r
+        tile = np.zeros((n, n, 4), dtype=np.uint8)
+        tile[(-border_size <= d) & (d <= 0)] = color
+        _corner_tile_cache[key] = tile
+    return tile
+
+
+def clear_corner_tile_cache():
+    _corner_tile_cache.clear()
+
+
+def compose_rounded_rect_rows(
+    w, h, y0, y1, border_size, border_color, corner_radius
+) -> np.ndarray:
+    """Assembles rows ``[y0, y1)`` of a rounded-rectangle border (nine-slice).
+
+    Matches ``sd_box`` pixel for pixel. Only the corner tiles are evaluated as
+    an SDF; the edges are filled by slicing.
+    """
+    color = to_ubyte_color(border_color)
+    rows = np.zeros((y1 - y0, w, 4), dtype=np.uint8)
+    # 上下の辺からの距離(上下対称のため、行の並びの向きに依存しない)
+    ys = np.arange(y0, y1)
+    ky = np.minimum(ys, h - 1 - ys)
+    # 角の丸みの外側は、最も近い辺からborder_size未満のピクセルが枠線になる
+    rows[ky < border_size] = color
+    rows[:, :border_size] = color
+    rows[:, max(w - border_size, 0) :] = color
+
+    corner = get_corner_tile(border_size, corner_radius, color)
+    n = corner.shape[0]
+    corner_rows = np.nonzero(ky < n)[0]
+    if n and corner_rows.size:
+        # 左右の辺からの距離がn未満の列を、角のタイル(左右反転を含む)で上書きする
+        #   幅が奇数の場合、中央の列は左側として扱う
+        left = min(n, (w + 1) // 2)
+        right = min(n, w // 2)
+        tiles = corner[ky[corner_rows]]
+        rows[corner_rows, :left] = tiles[:, :left]
+        if right:
+            rows[corner_rows, w - right :] = tiles[:, right - 1 :: -1]
+    return rows
+
+
+def iter_border_tiles(
+    w,
+    h,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    tile_rows=DEFAULT_TILE_ROWS,
+    reverse=False,
+):
+    """Yields ``(y, pixels)`` row tiles of a border image from the bottom row up.
+
+    ``pixels`` is a (rows, w, 4) uint8 array laid out like ``fb.read_color``.
+    With ``reverse`` the tiles come from the top down (rows within a tile
+    stay bottom-up).
+    """
+    color = to_ubyte_color(border_color)
+    half_w = np.float32(w / 2)
+    half_h = np.float32(h / 2)
+    # ピクセルの中心を、枠線の中心を原点とした座標で評価する
+    xs = (np.arange(w, dtype=np.float32) + np.float32(0.5)) - half_w
+    tile_starts = range(0, h, tile_rows)
+    for y0 in reversed(tile_starts) if reverse else tile_starts:
+        y1 = min(y0 + tile_rows, h)
+        if shape_type == SHAPE_TYPE_RECTANGLE:
+            yield y0, compose_rounded_rect_rows(
+                w, h, y0, y1, border_size, border_color, corner_radius
+            )
+            continue
+        ys = (np.arange(y0, y1, dtype=np.float32) + np.float32(0.5)) - half_h
+        px, py = np.meshgrid(xs, ys)
+        d = sd_ellipse(px, py, half_w, half_h)
+        mask = (-border_size <= d) & (d <= 0)
+        tile = np.zeros((y1 - y0, w, 4), dtype=np.uint8)
+        tile[mask] = color
+        yield y0, tile
+
+
+def render_border_pixels(
+    w,
+    h,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    tile_rows=DEFAULT_TILE_ROWS,
+) -> np.ndarray:
+    if shape_type == SHAPE_TYPE_RECTANGLE:
+        # 角のタイルと辺の塗りつぶしで組み立てるため、行に分けて評価する必要はない
+        rows = compose_rounded_rect_rows(
+            w, h, 0, h, border_size, border_color, corner_radius
+        )
+        return rows.reshape(-1)
+    pixels = np.empty((h, w, 4), dtype=np.uint8)
+    for y0, tile in iter_border_tiles(
+        w, h, shape_type, border_size, border_color, corner_radius, tile_rows
+    ):
+        pixels[y0 : y0 + tile.shape[0]] = tile
+    return pixels.reshape(-1)
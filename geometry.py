@@ -0,0 +1,55 @@
+# 枠線の位置とサイズの計算(bpyを使わない)
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Rect:
+    x: int
+    y: int
+    w: int
+    h: int
+
+
+def get_border_offset(strip_rect, screen_rect):
+    strip_center = (
+        strip_rect.x + (strip_rect.w / 2),
+        strip_rect.y - (strip_rect.h / 2),
+    )
+    # スクリーンの中央を取得
+    #    image stripはスクリーンの中央が基準のようなので..
+    screen_center = (screen_rect.w / 2, -1 * screen_rect.h / 2)
+    # placeholder stripと追加したimage stripの位置の差を取得
+    return (
+        round(strip_center[0] - screen_center[0]),
+        round(strip_center[1] - screen_center[1]),
+    )
+
+
+def get_transformed_border_rect(
+    rect, border_size, screen_rect, offset, scale, origin, proxy_scale=(1.0, 1.0)
+) -> Rect:
+    # 枠線ストリップのtransformから、表示されている枠線の内側の領域を求める
+    #   rectは画像を作成した時の内側の領域
+    #   proxy_scaleはプロキシ画像をフル解像度の大きさで表示するための倍率
+    #   拡大縮小はorigin(画像内の0-1の位置、yは下から)を基準に行われる
+    w, h = rect.w, rect.h
+    full_w = w + border_size * 2
+    full_h = h + border_size * 2
+    # フル解像度の画像に対する倍率
+    scale_x = scale[0] / proxy_scale[0]
+    scale_y = scale[1] / proxy_scale[1]
+    new_w = max(round(full_w * scale_x) - border_size * 2, 1)
+    new_h = max(round(full_h * scale_y) - border_size * 2, 1)
+    if (new_w, new_h) == (w, h) and tuple(offset) == get_border_offset(
+        rect, screen_rect
+    ):
+        # 移動も拡大縮小もされていない(中心位置の丸め誤差を持ち込まない)
+        return rect
+    # 基準点が中心以外の場合は、拡大縮小によって表示される中心が移動する
+    image_w = full_w / proxy_scale[0]
+    image_h = full_h / proxy_scale[1]
+    center_x = offset[0] + screen_rect.w / 2
+    center_x += (origin[0] - 0.5) * image_w * (1 - scale[0])
+    center_y = offset[1] - screen_rect.h / 2
+    center_y += (origin[1] - 0.5) * image_h * (1 - scale[1])
+    return Rect(round(center_x - new_w / 2), round(center_y + new_h / 2), new_w, new_h)
@@ -1,10 +1,19 @@
 import bpy
+from bpy.app.handlers import persistent
 from bpy.types import Context, Event
+from bpy_extras.io_utils import ExportHelper
+import collections
 import datetime
-import glob
+import functools
 import os
 import re
+import time
+from . import geometry
+from . import png_utils
+from . import shader_utils
+from . import stats
 from . import utils
+from . import worker
 
 
 DEFAULT_PLACEHOLDER_DURATION = 30
@@ -14,6 +23,18 @@ CUSTOM_KEY_PLACEHOLDER_ID = "placeholder_id"
 ADDON_NAME = "borderman"
 STRIP_TYPE_PLACEHOLDER = "placeholder"
 STRIP_TYPE_BORDER = "border"
+# 枠線ストリップの変更検出用
+CUSTOM_KEY_BORDER_RECT = "border_rect"
+CUSTOM_KEY_SHAPE_TYPE = "shape_type"
+CUSTOM_KEY_BORDER_SIZE = "border_size"
+CUSTOM_KEY_BORDER_COLOR = "border_color"
+CUSTOM_KEY_CORNER_RADIUS = "corner_radius"
+CUSTOM_KEY_ANIMATED = "border_animated"
+CUSTOM_KEY_FINGERPRINT = "fingerprint"
+# 編集用のプロキシ画像とフル解像度の画像
+CUSTOM_KEY_PROXY_IMAGE = utils.CUSTOM_KEY_PROXY_IMAGE
+CUSTOM_KEY_FULL_IMAGE = utils.CUSTOM_KEY_FULL_IMAGE
+CUSTOM_KEY_PROXY_SCALE = "border_proxy_scale"
 
 
 def is_placeholder(strip: bpy.types.Strip):
@@ -43,22 +64,388 @@ def is_addon_generated(strip: bpy.types.Strip):
         return False
 
 
+class StripIndex:
+    """Index of addon-generated strips in a scene, keyed by strip type."""
+
+    def __init__(self):
+        # strip_type -> ストリップ名の集合
+        #   複製したストリップはplaceholder_idも同じになるため、名前で管理する
+        self.entries = {STRIP_TYPE_PLACEHOLDER: set(), STRIP_TYPE_BORDER: set()}
+        # アドオンが生成したストリップ名
+        self.names = set()
+        # メタストリップに含まれないストリップ名
+        self.top_level_names = set()
+        # インデックス作成時の`strips_all`の数(変更検出用)
+        self.strip_count = -1
+        # prefix -> 最大の連番
+        self._max_strip_no = {}
+        # トップレベルのストリップのチャンネルごとの使用区間(必要になった時に作成)
+        self._channel_allocator = None
+        # アドオン自身による変更の後のdepsgraphの更新か
+        self.own_update = False
+        self.dirty = True
+
+    def rebuild(self, se: bpy.types.SequenceEditor):
+        for entries in self.entries.values():
+            entries.clear()
+        self.names.clear()
+        self._max_strip_no.clear()
+        self._channel_allocator = None
+        self.top_level_names = {strip.name for strip in se.strips}
+        for strip in se.strips_all:
+            if is_addon_generated(strip):
+                self._add(strip)
+        self.strip_count = len(se.strips_all)
+        self.dirty = False
+
+    def _add(self, strip: bpy.types.Strip):
+        name = strip.name
+        self.names.add(name)
+        entries = self.entries.get(strip.get(CUSTOM_KEY_STRIP_TYPE))
+        if entries is not None:
+            entries.add(name)
+        for prefix in self._max_strip_no:
+            strip_no = _parse_strip_no(name, prefix)
+            if strip_no is not None:
+                self._max_strip_no[prefix] = max(self._max_strip_no[prefix], strip_no)
+
+    def add(self, strip: bpy.types.Strip):
+        # アドオンがトップレベルに追加したストリップを登録する
+        self.add_many([strip])
+
+    def add_many(self, strips):
+        for strip in strips:
+            self._add(strip)
+            self.top_level_names.add(strip.name)
+        self.strip_count += len(strips)
+        if self._channel_allocator is not None:
+            self._channel_allocator.reserve_many(_get_intervals(strips))
+        self.own_update = True
+
+    def remove(self, strip: bpy.types.Strip):
+        # ストリップを削除する前に呼び出す
+        self.remove_many([strip])
+
+    def remove_many(self, strips):
+        if self._channel_allocator is not None:
+            self._channel_allocator.release_many(
+                _get_intervals(s for s in strips if s.name in self.top_level_names)
+            )
+        self.own_update = True
+        for strip in strips:
+            name = strip.name
+            self.names.discard(name)
+            self.top_level_names.discard(name)
+            entries = self.entries.get(strip.get(CUSTOM_KEY_STRIP_TYPE))
+            if entries is not None:
+                entries.discard(name)
+        self.strip_count -= len(strips)
+
+    def get_channel_allocator(self, se: bpy.types.SequenceEditor):
+        # アドオン以外でストリップが移動された場合などは、作り直す
+        if self._channel_allocator is None:
+            self._channel_allocator = utils.ChannelAllocator(se.strips)
+        return self._channel_allocator
+
+    def invalidate_channels(self):
+        self._channel_allocator = None
+
+    def max_strip_no(self, prefix):
+        if prefix not in self._max_strip_no:
+            numbers = [_parse_strip_no(name, prefix) for name in self.names]
+            self._max_strip_no[prefix] = max(
+                [no for no in numbers if no is not None], default=0
+            )
+        return self._max_strip_no[prefix]
+
+    def get_strips(self, se, strip_type, top_level_only=False):
+        # 名前が変更された場合などで見つからない場合はNoneを返す
+        results = []
+        for name in self.entries[strip_type]:
+            if top_level_only and name not in self.top_level_names:
+                continue
+            strip = se.strips_all.get(name)
+            if strip is None or strip.get(CUSTOM_KEY_STRIP_TYPE) != strip_type:
+                return None
+            results.append(strip)
+        return results
+
+
+def _get_intervals(strips):
+    # チャンネルの使用区間(channel, frame_start, frame_end)
+    return [
+        (strip.channel, strip.frame_final_start, strip.frame_final_end)
+        for strip in strips
+    ]
+
+
+def _parse_strip_no(strip_name, prefix):
+    if not strip_name.startswith(prefix):
+        return None
+    # prefixあり
+    m = re.match(rf"\A{re.escape(prefix)}(\d+)(.png)?", strip_name)
+    if not m:
+        return None
+    return int(m.group(1))
+
+
+# シーン(ポインタ) -> StripIndex
+_strip_indices = {}
+
+
+def get_strip_index(scene: bpy.types.Scene) -> StripIndex:
+    # アドオン以外によるストリップの追加/削除は、on_depsgraph_update_postで検出する
+    #   参照のたびに`strips_all`を数えない(数えるだけで全ストリップを走査する)
+    index = _strip_indices.setdefault(scene.as_pointer(), StripIndex())
+    if index.dirty:
+        index.rebuild(scene.sequence_editor)
+    return index
+
+
+def get_indexed_strips(scene: bpy.types.Scene, strip_type, top_level_only=False):
+    strips = get_strip_index(scene).get_strips(
+        scene.sequence_editor, strip_type, top_level_only
+    )
+    if strips is None:
+        # インデックスが古い場合は作り直す
+        index = _strip_indices[scene.as_pointer()]
+        index.rebuild(scene.sequence_editor)
+        strips = index.get_strips(scene.sequence_editor, strip_type, top_level_only)
+    return strips
+
+
+def invalidate_strip_indices():
+    _strip_indices.clear()
+
+
+@persistent
+def on_load_post(*args):
+    # 読み込んだファイルのインデックスは、次回の参照時に作成する
+    invalidate_strip_indices()
+    # 読み込み前のファイルの置き換え処理(モーダル)は終了している
+    close_running_job()
+
+
+@persistent
+def on_undo_redo_post(*args):
+    invalidate_strip_indices()
+
+
+@persistent
+def on_depsgraph_update_post(scene, depsgraph):
+    # アドオン以外で追加/削除されたストリップを検出し、インデックスを作り直す
+    index = _strip_indices.get(scene.as_pointer())
+    if index is None or index.dirty or not scene.sequence_editor:
+        return
+    # シーンが更新されていない場合は、ストリップの数を数えない
+    if not depsgraph.id_type_updated("SCENE"):
+        return
+    if index.strip_count != len(scene.sequence_editor.strips_all):
+        index.dirty = True
+    elif index.own_update:
+        # アドオン自身の追加/削除はチャンネルの使用区間に反映済み
+        index.own_update = False
+    else:
+        # ストリップの移動やトリムなど、数の変わらない変更の可能性がある
+        index.invalidate_channels()
+
+
+@persistent
+def on_render_pre(scene, *args):
+    if not scene.sequence_editor:
+        return
+    if bpy.app.background:
+        # バックグラウンド実行(blender -b -a など)では、render_preはメインスレッドから
+        #   呼ばれるため、ここでフル解像度の画像に切り替える(作成済みの場合は何もしない)
+        switch_border_variants(scene, use_full=True)
+        return
+    # プロキシ画像のままレンダリングされる枠線を知らせる
+    #   UIからのレンダリングでは、render_preはメインスレッド以外から呼ばれる場合が
+    #   あるため、画像の作成やストリップの変更(インデックスの更新を含む)は行わない
+    proxies = [
+        strip
+        for strip in scene.sequence_editor.strips_all
+        if is_showing_image(strip, CUSTOM_KEY_PROXY_IMAGE)
+    ]
+    if proxies:
+        print(
+            f"borderman: {len(proxies)} border(s) in '{scene.name}' are rendered "
+            "with proxy images (use 'Render with full-resolution borders')"
+        )
+
+
+@persistent
+def on_render_post(scene, *args):
+    # バックグラウンド実行で切り替えた画像を、編集用のプロキシ画像に戻す
+    if bpy.app.background and scene.sequence_editor:
+        switch_border_variants(scene, use_full=False)
+
+
+_handlers = [
+    (bpy.app.handlers.load_post, on_load_post),
+    (bpy.app.handlers.undo_post, on_undo_redo_post),
+    (bpy.app.handlers.redo_post, on_undo_redo_post),
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.render_pre, on_render_pre),
+    (bpy.app.handlers.render_complete, on_render_post),
+    (bpy.app.handlers.render_cancel, on_render_post),
+]
+
+
+def register_handlers():
+    for handlers, handler in _handlers:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister_handlers():
+    for handlers, handler in _handlers:
+        if handler in handlers:
+            handlers.remove(handler)
+    invalidate_strip_indices()
+    close_running_job()
+
+
+def store_border_fingerprint(
+    strip: bpy.types.Strip,
+    rect,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+):
+    strip[CUSTOM_KEY_BORDER_RECT] = [rect.x, rect.y, rect.w, rect.h]
+    strip[CUSTOM_KEY_SHAPE_TYPE] = shape_type
+    strip[CUSTOM_KEY_BORDER_SIZE] = int(border_size)
+    strip[CUSTOM_KEY_BORDER_COLOR] = list(border_color)
+    strip[CUSTOM_KEY_CORNER_RADIUS] = int(corner_radius)
+    strip[CUSTOM_KEY_FINGERPRINT] = utils.get_border_fingerprint(
+        rect, shape_type, border_size, border_color, corner_radius
+    )
+
+
+def set_border_image(strip: bpy.types.Strip, image_path):
+    rel_image_path = bpy.path.relpath(image_path)
+    strip.directory = os.path.join(os.path.dirname(rel_image_path), "")
+    strip.elements[0].filename = os.path.basename(rel_image_path)
+
+
+def is_showing_image(strip: bpy.types.Strip, key):
+    # カスタムプロパティのパスの画像を表示しているか
+    if key not in strip:
+        return False
+    image_path = os.path.join(strip.directory, strip.elements[0].filename)
+    return utils.normalize_path(image_path) == utils.normalize_path(strip[key])
+
+
+def get_proxy_scale(props):
+    # 編集用のプロキシ画像の倍率(1.0の場合はフル解像度の画像のみを作成する)
+    if not props.use_proxy_borders:
+        return 1.0
+    return props.proxy_percentage / 100
+
+
+def store_border_variants(
+    strip: bpy.types.Strip,
+    proxy_plan: utils.BorderImagePlan,
+    full_plan: utils.BorderImagePlan,
+):
+    # 編集中はプロキシ画像を拡大して表示し、レンダリング時にフル解像度の画像に切り替える
+    proxy_scale = [
+        full_plan.border_rect.w / proxy_plan.border_rect.w,
+        full_plan.border_rect.h / proxy_plan.border_rect.h,
+    ]
+    strip[CUSTOM_KEY_PROXY_IMAGE] = bpy.path.relpath(proxy_plan.output_path)
+    strip[CUSTOM_KEY_FULL_IMAGE] = bpy.path.relpath(full_plan.output_path)
+    strip[CUSTOM_KEY_PROXY_SCALE] = proxy_scale
+    # 中心を基準に拡大し、フル解像度の画像と同じ位置とサイズで表示する
+    strip.transform.origin = (0.5, 0.5)
+    strip.transform.scale_x, strip.transform.scale_y = proxy_scale
+
+
+def clear_border_variants(strip: bpy.types.Strip):
+    for key in (CUSTOM_KEY_PROXY_IMAGE, CUSTOM_KEY_FULL_IMAGE, CUSTOM_KEY_PROXY_SCALE):
+        if key in strip:
+            del strip[key]
+
+
+def create_full_variant(strip: bpy.types.Strip, props, render_backend):
+    # フル解像度の画像が無い場合のみ作成し、作成したかを返す
+    output_path = bpy.path.abspath(strip[CUSTOM_KEY_FULL_IMAGE])
+    if os.path.exists(output_path):
+        return False
+    utils.create_border_image(
+        output_path,
+        utils.Rect(*strip[CUSTOM_KEY_BORDER_RECT]),
+        strip[CUSTOM_KEY_SHAPE_TYPE],
+        strip[CUSTOM_KEY_BORDER_SIZE],
+        tuple(strip[CUSTOM_KEY_BORDER_COLOR]),
+        strip[CUSTOM_KEY_CORNER_RADIUS],
+        compress_level=props.png_compress_level,
+        render_backend=render_backend,
+        png_mode=props.png_output_mode,
+    )
+    return True
+
+
+def use_border_variant(strip: bpy.types.Strip, use_full):
+    key = CUSTOM_KEY_FULL_IMAGE if use_full else CUSTOM_KEY_PROXY_IMAGE
+    # 切り替え済みの場合は変更しない(キャッシュの無効化を避ける)
+    if is_showing_image(strip, key):
+        return
+    set_border_image(strip, strip[key])
+    # ユーザーが変更したスケールは保ち、プロキシ画像の拡大分のみを掛け外しする
+    proxy_x, proxy_y = strip[CUSTOM_KEY_PROXY_SCALE]
+    if use_full:
+        strip.transform.scale_x /= proxy_x
+        strip.transform.scale_y /= proxy_y
+    else:
+        strip.transform.scale_x *= proxy_x
+        strip.transform.scale_y *= proxy_y
+
+
+def get_variant_borders(scene: bpy.types.Scene):
+    # プロキシ画像を持つ枠線ストリップ(メタストリップ内を含む)
+    if not scene.sequence_editor:
+        return []
+    return [
+        strip
+        for strip in get_indexed_strips(scene, STRIP_TYPE_BORDER)
+        if CUSTOM_KEY_FULL_IMAGE in strip
+    ]
+
+
+def switch_border_variants(scene: bpy.types.Scene, use_full):
+    # メインスレッドから呼び出す(画像の作成とストリップの変更を行うため)
+    props = scene.borderman_props
+    created = 0
+    for strip in get_variant_borders(scene):
+        if use_full and create_full_variant(strip, props, props.render_backend):
+            created += 1
+        use_border_variant(strip, use_full)
+    return created
+
+
+def get_current_border_rect(strip: bpy.types.Strip, screen_rect):
+    # 枠線ストリップの現在の位置とスケールから、枠線の内側の領域を求める
+    trans = strip.transform
+    proxy_scale = (1.0, 1.0)
+    if is_showing_image(strip, CUSTOM_KEY_PROXY_IMAGE):
+        # プロキシ画像は拡大して表示しているため、その分を除く
+        proxy_scale = tuple(strip[CUSTOM_KEY_PROXY_SCALE])
+    return geometry.get_transformed_border_rect(
+        utils.Rect(*strip[CUSTOM_KEY_BORDER_RECT]),
+        strip[CUSTOM_KEY_BORDER_SIZE],
+        screen_rect,
+        (trans.offset_x, trans.offset_y),
+        (trans.scale_x, trans.scale_y),
+        tuple(trans.origin),
+        proxy_scale,
+    )
+
+
 def get_max_strip_no(context: bpy.types.Context, prefix):
-    max_no = 0
-    pattern = fr'\A{re.escape(prefix)}(\d+)(.png)?'
-    for strip in context.scene.sequence_editor.strips_all:
-        if not is_addon_generated(strip):
-            continue
-        strip_name = strip.name
-        if not strip_name.startswith(prefix):
-            continue
-        # prefixあり
-        m = re.match(pattern, strip_name)
-        if not m:
-            continue
-        strip_no = int(m.group(1))
-        max_no = max(max_no, strip_no)
-    return max_no
+    return get_strip_index(context.scene).max_strip_no(prefix)
 
 
 def get_strip_name(context, props):
@@ -78,12 +465,16 @@ class AddPlaceholder(bpy.types.Operator):
 
     def execute(self, context):
         props = context.scene.borderman_props
+        strip_index = get_strip_index(context.scene)
         cur_frame = bpy.context.scene.frame_current
         seqs = bpy.context.scene.sequence_editor.strips
         frame_end = cur_frame + props.placeholder_duration
 
         target_channel = utils.guess_available_channel(
-            cur_frame, frame_end, props.placeholder_channel_no, seqs
+            cur_frame,
+            frame_end,
+            props.placeholder_channel_no,
+            strip_index.get_channel_allocator(context.scene.sequence_editor),
         )
 
         strip_name = get_strip_name(context, props)
@@ -104,6 +495,7 @@ class AddPlaceholder(bpy.types.Operator):
         placeholder_strip[CUSTOM_KEY_GENERATER] = ADDON_NAME
         placeholder_strip[CUSTOM_KEY_STRIP_TYPE] = STRIP_TYPE_PLACEHOLDER
         placeholder_strip[CUSTOM_KEY_PLACEHOLDER_ID] = placeholder_strip.name
+        strip_index.add(placeholder_strip)
 
         bpy.ops.sequencer.select_all(action="DESELECT")
         context.scene.sequence_editor.active_strip = placeholder_strip
@@ -117,35 +509,29 @@ class DeleteUnusedBorderImages(bpy.types.Operator):
     bl_description = "Delete unused border images."
     bl_options = {"REGISTER", "UNDO"}
 
-    def get_border_images(self, context: Context):
-        results = []
-        for strip in context.strips:
-            if not is_border_image(strip):
-                continue
-            img_strip: bpy.types.ImageStrip = strip
-            elm = img_strip.elements[0]
-            if not elm:
-                continue
-            img_path = os.path.join(img_strip.directory, elm.filename)
-            abs_img_path = bpy.path.abspath(img_path)
-            results.append(abs_img_path)
-        return results
+    dry_run: bpy.props.BoolProperty(
+        name="Dry Run",
+        description="Only report unused images without deleting them",
+        default=False,
+    )  # type: ignore
+
+    _messages_image_dir = ("Settingsの`Image Dir`を確認してください。",)
 
     def delete_unused_border_iamges(self, context, image_dir):
-        used_list = self.get_border_images(context)
-        abs_image_dir = bpy.path.abspath(image_dir)
-        path_pattern = os.path.join(abs_image_dir, "*.png")
-        for img_path in glob.glob(path_pattern):
-            if img_path not in used_list:
-                print("remove unused image...", img_path)
-                os.remove(img_path)
+        count, reclaimed_bytes = utils.sweep_unused_images(image_dir, self.dry_run)
+
+        size = utils.format_bytes(reclaimed_bytes)
+        if self.dry_run:
+            self.report({"INFO"}, f"未使用の画像: {count}ファイル({size})")
+        else:
+            self.report({"INFO"}, f"未使用の画像を削除: {count}ファイル({size})")
         return {"FINISHED"}
 
     def execute(self, context):
         props = context.scene.borderman_props
         if not props.image_dir:
             utils.showMessageBox(
-                messages=self._messages_no_placeholder,
+                messages=self._messages_image_dir,
                 title="枠線画像ファイルの保存ディレクトリが指定されていません。",
                 icon="ERROR",
             )
@@ -153,20 +539,14 @@ class DeleteUnusedBorderImages(bpy.types.Operator):
         image_dir = utils.normalize_image_dir(props.image_dir)
         if not image_dir:
             utils.showMessageBox(
-                messages=self._messages_no_placeholder,
-                title="枠線画像ファイルの保存ディレクトリが指定されていません。",
-                icon="ERROR",
-            )
-        if not image_dir:
-            utils.showMessageBox(
-                messages=self._messages_no_placeholder,
+                messages=self._messages_image_dir,
                 title="プロジェクトを保存してから実行してください。",
                 icon="ERROR",
             )
             return {"CANCELLED"}
         if not os.path.exists(image_dir):
             utils.showMessageBox(
-                messages=self._messages_no_placeholder,
+                messages=self._messages_image_dir,
                 title="枠線画像ファイルの保存ディレクトリが存在しません。",
                 icon="ERROR",
             )
@@ -175,18 +555,10 @@ class DeleteUnusedBorderImages(bpy.types.Operator):
         return self.delete_unused_border_iamges(context, image_dir)
 
 
-class ReplacePlaceholdersToBorder(bpy.types.Operator):
-    _timer = None
-    _messages_no_placeholder = ("",)
-
-    @classmethod
-    def poll(cls, context):
-        return context.space_data.view_type == "SEQUENCER"
-
-    def get_target_placeholders(self, context: Context):
-        return []
+class BorderReplaceJob:
+    """Renders border images for placeholders and swaps them into the timeline."""
 
-    def add_border_strip(
+    def __init__(
         self,
         context: Context,
         target_strip_list,
@@ -195,93 +567,461 @@ class ReplacePlaceholdersToBorder(bpy.types.Operator):
         border_color,
         border_size,
         corner_radius,
+        compress_level,
+        use_pipeline,
+        use_atlas,
+        render_backend=utils.RENDER_BACKEND_AUTO,
+        png_mode=png_utils.PNG_MODE_RGBA,
+        num_workers=0,
+        proxy_scale=1.0,
     ):
-        screen_rect = utils.get_screen_rect()
+        # モーダル処理ではイベントをまたいで使うため、contextではなくシーン名を保持する
+        #   処理中の取り消し(Undo)でシーンが読み直されても参照できる
+        self.scene_name = context.scene.name
+        self.shape_type = shape_type
+        self.border_color = tuple(border_color)
+        self.border_size = border_size
+        self.corner_radius = corner_radius
+        self.compress_level = compress_level
+        self.png_mode = png_mode
+        self.render_backend = utils.resolve_render_backend(render_backend, shape_type)
+        # ワーカーのプロセスではGPUの有無が異なるため、指定された値のまま渡す
+        self.requested_backend = render_backend
+        self.screen_rect = utils.get_screen_rect(utils.FULL_RESOLUTION_PERCENTAGE)
+        self.image_dir = image_dir
+
+        style = (shape_type, border_size, border_color, corner_radius)
+        items = []
+        # placeholder名 -> 揃っていない枠線画像の数
+        self._remaining = {}
         for strip in target_strip_list:
-            rect = utils.get_placeholder_info(strip)
-            img_strip = utils.create_border_strip(
-                strip,
-                image_dir,
-                shape_type,
-                border_size,
-                border_color,
-                corner_radius,
+            plan = utils.plan_border_sequence(strip, image_dir, *style)
+            if plan is None:
+                # proxy_scaleが1未満の場合は、編集用のプロキシ画像のみを描画する
+                #   フル解像度の画像はレンダリングの直前に作成する
+                plan = utils.plan_border_image(
+                    strip, image_dir, *style, scale=proxy_scale
+                )
+                images = (plan,)
+            else:
+                images = plan.images
+            self._remaining[strip.name] = len(images)
+            # 処理中に削除されたplaceholderを参照しないよう、名前で保持する
+            items.extend((strip.name, plan, image) for image in images)
+        # 大きいオフスクリーンから確保し、以降の小さい枠線で再利用する
+        items.sort(key=lambda p: self.get_offscreen_area(p[2]), reverse=True)
+        self._queue = collections.deque(items)
+        self.total = len(target_strip_list)
+        self.attached = 0
+        # 処理中に削除されたため、置き換えなかったplaceholderの数
+        self.skipped = 0
+        # 枠線画像が揃い、flush()で置き換えるplaceholderのリスト
+        self._ready = []
+        # 書き込み待ちの出力パス -> 完了後に置き換えるplaceholderのリスト
+        self._waiting = {}
+        self.offscreen_pool = utils.OffscreenPool()
+        # パイプライン時は、メインスレッドではGPUの描画/読み出しとストリップの
+        # 更新のみを行い、PNGのエンコードと書き込みはスレッドプールで行う
+        self.writer = utils.BorderImageWriter() if use_pipeline else None
+        # ワーカー使用時は、描画とPNGの書き込みをすべて別プロセスで行う
+        self.workers = None
+        if num_workers:
+            self.workers = worker.WorkerPool(bpy.app.binary_path, num_workers)
+            self.writer = None
+        # アトラス描画時は、複数の枠線を1回の描画と読み出しで処理する
+        self.batch_size = shader_utils.MAX_ATLAS_INSTANCES if use_atlas else 1
+        self._started = time.perf_counter()
+
+    @property
+    def scene(self):
+        return bpy.data.scenes[self.scene_name]
+
+    @classmethod
+    def from_props(
+        cls, context: Context, target_strip_list, image_dir, props, proxy_scale=None
+    ):
+        stats.get_stats().sync_gpu = props.stats_sync_gpu
+        if proxy_scale is None:
+            proxy_scale = get_proxy_scale(props)
+        return cls(
+            context,
+            target_strip_list,
+            image_dir,
+            props.shape_type,
+            props.border_color,
+            props.border_size,
+            props.corner_radius,
+            props.png_compress_level,
+            props.use_threaded_encode,
+            props.use_atlas_render,
+            props.render_backend,
+            props.png_output_mode,
+            props.worker_count if props.use_worker_processes else 0,
+            proxy_scale,
+        )
+
+    def run(self):
+        # モーダルを使わずに最後まで処理する(バックグラウンド実行用)
+        try:
+            while self._queue:
+                if not self.step():
+                    # ワーカーの処理中の依頼が上限に達している
+                    self.attach_completed(wait=True)
+            self.finish()
+        finally:
+            self.close()
+
+    @staticmethod
+    def get_offscreen_area(plan: utils.BorderImagePlan):
+        info = shader_utils.get_offscreen_info(plan.border_rect)
+        return info.w * info.h
+
+    def is_throttled(self):
+        # ワーカーへの依頼が上限に達し、完了を待つ必要があるか
+        return self.workers is not None and self.workers.is_full()
+
+    def step(self):
+        # placeholderをまとめて処理し、続けて処理できるものが残っているかを返す
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            # 依頼を送り続けるとパイプへの書き込みでメインスレッドが止まるため、
+            # ワーカーの処理中の依頼が上限に達したら次のタイマーイベントまで待つ
+            if self.is_throttled():
+                break
+            name, plan, image = self._queue.popleft()
+            if self.share_existing(name, plan, image):
+                continue
+            self._waiting[image.output_path] = [(name, plan)]
+            if self.workers:
+                self.workers.submit(self.make_worker_request(image))
+            elif utils.needs_tiled_render(image.border_rect, self.render_backend):
+                self.render_tiled(image)
+            else:
+                batch.append(image)
+        if batch:
+            self.render(batch)
+        self.attach_completed()
+        return len(self._queue) > 0 and not self.is_throttled()
+
+    def share_existing(self, name, plan, image: utils.BorderImagePlan):
+        output_path = image.output_path
+        # 同じ内容の枠線画像を書き込み中なら、完了を待って共有する
+        if output_path in self._waiting:
+            self._waiting[output_path].append((name, plan))
+            return True
+        # 同じ内容の枠線画像が既に存在する場合は描画を省略して共有する
+        if os.path.exists(output_path):
+            stats.count(stats.COUNTER_CACHE_HITS)
+            self.image_ready(name, plan)
+            return True
+        return False
+
+    def image_ready(self, name, plan):
+        # 枠線画像がすべて揃ったplaceholderから置き換える
+        self._remaining[name] -= 1
+        if self._remaining[name] == 0:
+            del self._remaining[name]
+            self.attach(name, plan)
+
+    def get_render_style(self, plan: utils.BorderImagePlan):
+        # プロキシの場合は、縮小した太さと角の丸みで描画する
+        border_size, corner_radius = utils.scale_border_style(
+            self.border_size, self.corner_radius, plan.scale
+        )
+        return self.shape_type, border_size, self.border_color, corner_radius
+
+    def make_worker_request(self, plan: utils.BorderImagePlan):
+        return worker.make_request(
+            plan,
+            *self.get_render_style(plan),
+            self.compress_level,
+            self.png_mode,
+            self.requested_backend,
+        )
+
+    def render_tiled(self, plan: utils.BorderImagePlan):
+        # 大きい枠線はタイルごとに描画しながら書き出し、全体をメモリに保持しない
+        utils.create_border_image(
+            plan.output_path,
+            plan.render_rect,
+            *self.get_render_style(plan),
+            offscreen_pool=self.offscreen_pool,
+            compress_level=self.compress_level,
+            render_backend=self.render_backend,
+            png_mode=self.png_mode,
+        )
+        for waiting_name, waiting_plan in self._waiting.pop(plan.output_path):
+            self.image_ready(waiting_name, waiting_plan)
+
+    def render(self, plans):
+        requests = [
+            utils.BorderRenderRequest(plan.render_rect, *self.get_render_style(plan))
+            for plan in plans
+        ]
+        if self.render_backend == utils.RENDER_BACKEND_CPU:
+            pixels_list = [
+                utils.render_border_pixels_cpu(
+                    plan.render_rect, *self.get_render_style(plan)
+                )
+                for plan in plans
+            ]
+        elif len(requests) > 1:
+            pixels_list = utils.render_border_pixels_batch(
+                requests, offscreen_pool=self.offscreen_pool
             )
-            strip_center = (rect.x + (rect.w / 2), rect.y - (rect.h / 2))
-            # スクリーンの中央を取得
-            #    image stripはスクリーンの中央が基準のようなので..
-            screen_center = (screen_rect.w / 2, -1 * screen_rect.h / 2)
-            # placeholder stripと追加したimage stripの位置の差を取得
-            diff_center = (
-                round(strip_center[0] - screen_center[0]),
-                round(strip_center[1] - screen_center[1]),
+        else:
+            pixels_list = [
+                utils.render_border_pixels(
+                    plans[0].render_rect,
+                    *self.get_render_style(plans[0]),
+                    offscreen_pool=self.offscreen_pool,
+                )
+            ]
+
+        for plan, pixels in zip(plans, pixels_list):
+            output_path = plan.output_path
+            if self.writer:
+                self.writer.submit(
+                    output_path,
+                    pixels,
+                    plan.border_rect.w,
+                    plan.border_rect.h,
+                    self.compress_level,
+                    self.png_mode,
+                )
+            else:
+                utils.write_border_png(
+                    output_path,
+                    pixels,
+                    plan.border_rect.w,
+                    plan.border_rect.h,
+                    self.compress_level,
+                    self.png_mode,
+                )
+                for waiting_name, waiting_plan in self._waiting.pop(output_path):
+                    self.image_ready(waiting_name, waiting_plan)
+
+    def attach_completed(self, wait=False):
+        for source in (self.writer, self.workers):
+            if not source:
+                continue
+            for output_path in source.pop_completed(wait=wait):
+                for name, plan in self._waiting.pop(output_path):
+                    self.image_ready(name, plan)
+
+    def is_finished(self):
+        return not self._queue and not self._waiting and not self._ready
+
+    def finish(self):
+        # 書き込み中の画像をすべて待ってから置き換える
+        self.attach_completed(wait=True)
+        self.flush()
+
+    def cancel(self):
+        # 未処理のplaceholderはそのまま残し、処理中のものだけ置き換えを完了させる
+        self._queue.clear()
+        self.finish()
+
+    def close(self):
+        self.offscreen_pool.free()
+        if self.writer:
+            self.writer.shutdown()
+        if self.workers:
+            # 例外などで処理中の依頼が残っている場合は、ワーカーを停止する
+            self.workers.shutdown(cancel=len(self.workers) > 0)
+        stats.get_stats().add_time(
+            stats.STAGE_REPLACE, time.perf_counter() - self._started
+        )
+        for line in stats.get_stats().format_lines():
+            print(f"borderman stats: {line}")
+
+    def attach(self, name, plan):
+        # シーケンサーの変更はflush()でまとめて行う
+        self._ready.append((name, plan))
+
+    def flush(self):
+        # 枠線画像が揃ったplaceholderを1回の処理でまとめて置き換える
+        #   placeholderを先にすべて削除し、枠線ストリップを元のチャンネルに直接追加する
+        #   (一時的なチャンネルへの追加と、チャンネルの移動による重なりの判定を省く)
+        if not self._ready:
+            return
+        ready, self._ready = self._ready, []
+        strip_index = get_strip_index(self.scene)
+        strips = self.scene.sequence_editor.strips
+        with stats.stage(stats.STAGE_STRIP_CREATION):
+            placeholders = []
+            slots = []
+            for name, plan in ready:
+                strip = strips.get(name)
+                if strip is None or not is_placeholder(strip):
+                    # 処理中に削除(または名前を変更)されたplaceholderは置き換えない
+                    self.skipped += 1
+                    continue
+                placeholders.append(strip)
+                slots.append((utils.get_placeholder_slot(strip), plan))
+            # チャンネルの使用区間はまとめて更新する
+            strip_index.remove_many(placeholders)
+            for strip, (_, plan) in zip(placeholders, slots):
+                if isinstance(plan, utils.BorderSequencePlan):
+                    utils.remove_transform_fcurves(strip)
+                strips.remove(strip)
+            strip_index.add_many([self.add_border(slot, plan) for slot, plan in slots])
+        stats.count(stats.COUNTER_STRIPS_CREATED, len(slots))
+        self.attached += len(slots)
+
+    def add_border(self, slot: utils.PlaceholderSlot, plan):
+        if isinstance(plan, utils.BorderSequencePlan):
+            # フレームごとの画像とキーフレームで、placeholderの動きを再現する
+            img_strip = utils.add_border_sequence_strip(
+                slot, plan, self.screen_rect, channel=slot.channel
+            )
+            img_strip[CUSTOM_KEY_ANIMATED] = True
+        else:
+            img_strip = utils.add_border_image_strip(
+                slot, plan.output_path, channel=slot.channel
             )
             # image stripの中心をplaceholder stripの中心に移動
+            diff_center = utils.get_border_offset(plan.rect, self.screen_rect)
             img_strip.transform.offset_x = diff_center[0]
             img_strip.transform.offset_y = diff_center[1]
-            # image stripのメタ情報を設定
-            img_strip[CUSTOM_KEY_GENERATER] = ADDON_NAME
-            img_strip[CUSTOM_KEY_STRIP_TYPE] = STRIP_TYPE_BORDER
+            style = (
+                self.shape_type,
+                self.border_size,
+                self.border_color,
+                self.corner_radius,
+            )
+            store_border_fingerprint(img_strip, plan.rect, *style)
+            if plan.scale != 1.0:
+                full_plan = utils.get_border_image_plan(
+                    plan.rect, self.image_dir, *style
+                )
+                store_border_variants(img_strip, plan, full_plan)
+        # image stripのメタ情報を設定
+        img_strip[CUSTOM_KEY_GENERATER] = ADDON_NAME
+        img_strip[CUSTOM_KEY_STRIP_TYPE] = STRIP_TYPE_BORDER
+        img_strip[CUSTOM_KEY_PLACEHOLDER_ID] = slot.placeholder_id
+        return img_strip
 
-            # image stripのチャンネルを更新
-            #   stripが重なることを防ぐため、placeholder stripを削除してから更新する
-            org_channel = strip.channel
-            context.scene.sequence_editor.strips.remove(strip)
-            img_strip.channel = org_channel
 
-        return {"FINISHED"}
+# モーダル処理のタイマー間隔と、1回のタイマーイベントで処理に使う時間(秒)
+TICK_INTERVAL = 0.01
+TIME_BUDGET_PER_TICK = 0.1
 
-    def modal(self, context: Context, event: Event):
-        if event.type == "TIMER":
-            context.window_manager.event_timer_remove(self._timer)
-
-            selected_placeholders = self.get_target_placeholders(context)
-            if len(selected_placeholders) == 0:
-                utils.showMessageBox(
-                    messages=self._messages_no_placeholder,
-                    title="処理対象がありません!!",
-                    icon="ERROR",
-                )
-                return {"CANCELLED"}
-
-            props = context.scene.borderman_props
-            if not props.image_dir:
-                utils.showMessageBox(
-                    messages=self._messages_no_placeholder,
-                    title="枠線画像ファイルの保存ディレクトリが指定されていません。",
-                    icon="ERROR",
-                )
-                return {"CANCELLED"}
-            image_dir = utils.normalize_image_dir(props.image_dir)
-            if not image_dir:
-                # 事前にプロジェクトの保存をチェックするため、通常ありえない
-                utils.showMessageBox(
-                    messages=self._messages_no_placeholder,
-                    title="プロジェクトを保存してから実行してください。",
-                    icon="ERROR",
-                )
-                return {"CANCELLED"}
-            if not os.path.exists(image_dir):
-                self.report(
-                    {"INFO"},
-                    f"画像保存ディレクトリが存在しないため作成:{image_dir}",
-                )
-                os.makedirs(image_dir)
+# 実行中の置き換えジョブ(同時に1つのみ)
+#   オペレーターのインスタンスは実行ごとに作られるため、モジュールで保持する
+_running_job = None
 
-            bpy.ops.sequencer.select_all(action="DESELECT")
-            ret = self.add_border_strip(
-                context,
-                selected_placeholders,
-                image_dir,
-                props.shape_type,
-                props.border_color,
-                props.border_size,
-                props.corner_radius,
+
+def is_replace_running():
+    return _running_job is not None
+
+
+def close_running_job():
+    # ファイルの読み込みなどでモーダル処理が終了した場合に、ワーカーなどを解放する
+    global _running_job
+    job, _running_job = _running_job, None
+    if job is not None:
+        job.close()
+
+
+class ReplacePlaceholdersToBorder(bpy.types.Operator):
+    _timer = None
+    _job = None
+    _messages_no_placeholder = ("",)
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data.view_type == "SEQUENCER" and not is_replace_running()
+
+    def get_target_placeholders(self, context: Context):
+        return []
+
+    def prepare(self, context: Context):
+        # 処理対象と保存先を検証し、処理用のジョブを作成する
+        selected_placeholders = self.get_target_placeholders(context)
+        if len(selected_placeholders) == 0:
+            utils.showMessageBox(
+                messages=self._messages_no_placeholder,
+                title="処理対象がありません!!",
+                icon="ERROR",
             )
+            return None
+
+        props = context.scene.borderman_props
+        if not props.image_dir:
+            utils.showMessageBox(
+                messages=self._messages_no_placeholder,
+                title="枠線画像ファイルの保存ディレクトリが指定されていません。",
+                icon="ERROR",
+            )
+            return None
+        image_dir = utils.normalize_image_dir(props.image_dir)
+        if not image_dir:
+            # 事前にプロジェクトの保存をチェックするため、通常ありえない
+            utils.showMessageBox(
+                messages=self._messages_no_placeholder,
+                title="プロジェクトを保存してから実行してください。",
+                icon="ERROR",
+            )
+            return None
+        if not os.path.exists(image_dir):
+            self.report(
+                {"INFO"},
+                f"画像保存ディレクトリが存在しないため作成:{image_dir}",
+            )
+            os.makedirs(image_dir)
+
+        bpy.ops.sequencer.select_all(action="DESELECT")
+        return BorderReplaceJob.from_props(
+            context, selected_placeholders, image_dir, props
+        )
+
+    def finish_job(self, context: Context):
+        global _running_job
+        wm = context.window_manager
+        if self._timer:
+            wm.event_timer_remove(self._timer)
             self._timer = None
-            return ret
-        else:
-            return {"RUNNING_MODAL"}
+        wm.progress_end()
+        _running_job = None
+        self._job.close()
+        self._job = None
+
+    def modal(self, context: Context, event: Event):
+        job = self._job
+        if event.type == "ESC":
+            # 処理済みのplaceholderのみ置き換えた状態で終了する
+            try:
+                job.cancel()
+            finally:
+                attached, total = job.attached, job.total
+                self.finish_job(context)
+            self.report({"WARNING"}, f"キャンセルしました({attached}/{total})")
+            return {"FINISHED"}
+
+        if event.type != "TIMER":
+            # 処理中も編集を続けられるよう、他のイベントはそのまま渡す
+            return {"PASS_THROUGH"}
+
+        try:
+            # 1回のタイマーイベントで処理する時間を制限し、UIの更新を妨げない
+            deadline = time.perf_counter() + TIME_BUDGET_PER_TICK
+            while job.step() and time.perf_counter() < deadline:
+                pass
+            job.flush()
+            context.window_manager.progress_update(job.attached)
+            if not job.is_finished():
+                return {"RUNNING_MODAL"}
+        except Exception:
+            self.finish_job(context)
+            raise
+
+        message = f"完了しました({job.attached}/{job.total})"
+        if job.skipped:
+            message += f", 削除されたplaceholder: {job.skipped}"
+        self.report({"INFO"}, message)
+        self.finish_job(context)
+        return {"FINISHED"}
 
     def invoke(self, context: Context, event: Event):
         # blendファイルの存在チェック
@@ -296,12 +1036,19 @@ class ReplacePlaceholdersToBorder(bpy.types.Operator):
             )
             return {"CANCELLED"}
 
-        if self._timer:
+        global _running_job
+        if is_replace_running():
             self.report({"WARNING"}, "処理中のためキャンセル")
             return {"CANCELLED"}
-        self.report({"INFO"}, "処理中...")
-        self._timer = context.window_manager.event_timer_add(1.0, window=context.window)
-        context.window_manager.modal_handler_add(self)
+        self._job = self.prepare(context)
+        if not self._job:
+            return {"CANCELLED"}
+        _running_job = self._job
+        self.report({"INFO"}, "処理中...(ESCでキャンセル)")
+        wm = context.window_manager
+        wm.progress_begin(0, self._job.total)
+        self._timer = wm.event_timer_add(TICK_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
         return {"RUNNING_MODAL"}
 
 
@@ -329,12 +1076,275 @@ class ReplaceAllPlaceholdersToBorder(ReplacePlaceholdersToBorder):
     )
 
     def get_target_placeholders(self, context: Context):
-        return [strip for strip in context.strips if is_placeholder(strip)]
+        # メタストリップの編集中は、表示中のストリップのみを対象にする
+        if context.scene.sequence_editor.meta_stack:
+            return [strip for strip in context.strips if is_placeholder(strip)]
+        return get_indexed_strips(
+            context.scene, STRIP_TYPE_PLACEHOLDER, top_level_only=True
+        )
+
+
+def get_stored_border_style(strip: bpy.types.Strip):
+    # 枠線ストリップを作成した時の形状、太さ、色、角の丸み
+    return (
+        strip[CUSTOM_KEY_SHAPE_TYPE],
+        strip[CUSTOM_KEY_BORDER_SIZE],
+        tuple(strip[CUSTOM_KEY_BORDER_COLOR]),
+        strip[CUSTOM_KEY_CORNER_RADIUS],
+    )
+
+
+class UpdateBorders(bpy.types.Operator):
+    _messages_no_border = ("",)
+    # パネルの枠線の設定で描き直すか(Falseの場合は各ストリップの設定を保つ)
+    use_panel_style = False
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data.view_type == "SEQUENCER"
+
+    def get_target_borders(self, context: Context):
+        return []
+
+    def update_border(self, strip, image_dir, screen_rect, props):
+        rect = get_current_border_rect(strip, screen_rect)
+        if self.use_panel_style:
+            style = (
+                props.shape_type,
+                props.border_size,
+                tuple(props.border_color),
+                props.corner_radius,
+            )
+        else:
+            style = get_stored_border_style(strip)
+        fingerprint = utils.get_border_fingerprint(rect, *style)
+        proxy_scale = get_proxy_scale(props)
+        plan = utils.get_border_image_plan(rect, image_dir, *style, scale=proxy_scale)
+        # プロキシの使用の有無や倍率を変更した場合も作り直す
+        #   画像名は描画内容のハッシュのため、プロキシ画像の名前で倍率の変更を検出できる
+        if proxy_scale != 1.0:
+            proxy_image = strip.get(CUSTOM_KEY_PROXY_IMAGE)
+            is_same_proxy = proxy_image is not None and os.path.basename(
+                proxy_image
+            ) == os.path.basename(plan.output_path)
+        else:
+            is_same_proxy = CUSTOM_KEY_PROXY_IMAGE not in strip
+        if fingerprint == strip.get(CUSTOM_KEY_FINGERPRINT) and is_same_proxy:
+            return False
+
+        # 同じ内容の枠線画像が既に存在する場合は描画を省略する(移動のみの場合など)
+        if not os.path.exists(plan.output_path):
+            shape_type, border_size, border_color, corner_radius = style
+            border_size, corner_radius = utils.scale_border_style(
+                border_size, corner_radius, proxy_scale
+            )
+            utils.create_border_image(
+                plan.output_path,
+                plan.render_rect,
+                shape_type,
+                border_size,
+                border_color,
+                corner_radius,
+                compress_level=props.png_compress_level,
+                png_mode=props.png_output_mode,
+                render_backend=props.render_backend,
+            )
+        set_border_image(strip, plan.output_path)
+        # スケールを描画結果に反映したため元に戻し、中心を合わせ直す
+        strip.transform.scale_x = 1.0
+        strip.transform.scale_y = 1.0
+        diff_center = utils.get_border_offset(rect, screen_rect)
+        strip.transform.offset_x = diff_center[0]
+        strip.transform.offset_y = diff_center[1]
+        store_border_fingerprint(strip, rect, *style)
+        if proxy_scale != 1.0:
+            full_plan = utils.get_border_image_plan(rect, image_dir, *style)
+            store_border_variants(strip, plan, full_plan)
+        else:
+            clear_border_variants(strip)
+        return True
+
+    def execute(self, context):
+        if not bpy.data.is_saved:
+            self.report({"ERROR"}, "プロジェクトを保存してから実行してください。")
+            return {"CANCELLED"}
+        props = context.scene.borderman_props
+        image_dir = utils.normalize_image_dir(props.image_dir)
+        if not image_dir:
+            self.report(
+                {"ERROR"}, "枠線画像ファイルの保存ディレクトリが指定されていません。"
+            )
+            return {"CANCELLED"}
+        target_borders = self.get_target_borders(context)
+        if len(target_borders) == 0:
+            utils.showMessageBox(
+                messages=self._messages_no_border,
+                title="処理対象がありません!!",
+                icon="ERROR",
+            )
+            return {"CANCELLED"}
+        os.makedirs(image_dir, exist_ok=True)
+
+        screen_rect = utils.get_screen_rect(utils.FULL_RESOLUTION_PERCENTAGE)
+        updated = unchanged = legacy = animated = 0
+        for strip in target_borders:
+            # フレームごとの画像を持つ枠線は、置き換え直しで更新する
+            if strip.get(CUSTOM_KEY_ANIMATED):
+                animated += 1
+            # 変更検出用の情報を持たない、以前のバージョンで作成した枠線
+            elif CUSTOM_KEY_FINGERPRINT not in strip:
+                legacy += 1
+            elif self.update_border(strip, image_dir, screen_rect, props):
+                updated += 1
+            else:
+                unchanged += 1
+
+        self.report(
+            {"INFO"},
+            f"更新: {updated}, 変更なし: {unchanged}, 対象外(旧形式): {legacy}, "
+            f"対象外(アニメーション): {animated}",
+        )
+        return {"FINISHED"}
+
+
+class UpdateSelectedBorders(UpdateBorders):
+    bl_idname = "borderman.update_selected_borders"
+    bl_label = "Update selected borders"
+    bl_description = (
+        "Re-render selected border strips whose geometry or style has changed."
+    )
+    bl_options = {"REGISTER", "UNDO"}
+
+    _messages_no_border = ("1つ以上の枠線ストリップを選択してください!!",)
+
+    use_panel_style: bpy.props.BoolProperty(
+        name="Use Panel Style",
+        description="Re-render with the border style of the panel",
+        default=False,
+    )  # type: ignore
+
+    def get_target_borders(self, context: Context):
+        return [strip for strip in context.selected_strips if is_border_image(strip)]
+
+
+class UpdateAllBorders(UpdateBorders):
+    bl_idname = "borderman.update_all_borders"
+    bl_label = "Update all borders"
+    bl_description = "Re-render border strips whose geometry has changed."
+    bl_options = {"REGISTER", "UNDO"}
+
+    _messages_no_border = ("枠線ストリップがありません。",)
+
+    def get_target_borders(self, context: Context):
+        return get_indexed_strips(context.scene, STRIP_TYPE_BORDER, top_level_only=True)
+
+
+class CreateFullResolutionBorders(bpy.types.Operator):
+    bl_idname = "borderman.create_full_resolution_borders"
+    bl_label = "Create full-resolution borders"
+    bl_description = (
+        "Create missing full-resolution images of proxy border strips before render."
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data.view_type == "SEQUENCER"
+
+    def execute(self, context):
+        # レンダリング前にまとめて作成しておき、レンダリング開始時の待ち時間を減らす
+        props = context.scene.borderman_props
+        strips = get_variant_borders(context.scene)
+        created = 0
+        for strip in strips:
+            if create_full_variant(strip, props, props.render_backend):
+                created += 1
+        self.report({"INFO"}, f"作成: {created}, 作成済み: {len(strips) - created}")
+        return {"FINISHED"}
+
+
+# レンダリングの終了を確認する間隔(秒)
+RENDER_POLL_INTERVAL = 0.5
+
+
+def restore_proxy_borders(scene_name):
+    # レンダリングが終わるまで待ってから(キャンセルを含む)、プロキシ画像に戻す
+    #   タイマーはメインスレッドで実行されるため、ストリップを安全に変更できる
+    if bpy.app.is_job_running("RENDER"):
+        return RENDER_POLL_INTERVAL
+    scene = bpy.data.scenes.get(scene_name)
+    if scene is not None:
+        switch_border_variants(scene, use_full=False)
+    return None
+
+
+class RenderWithFullResolutionBorders(bpy.types.Operator):
+    bl_idname = "borderman.render_with_full_resolution_borders"
+    bl_label = "Render with full-resolution borders"
+    bl_description = (
+        "Switch proxy border strips to full-resolution images while rendering."
+    )
+
+    animation: bpy.props.BoolProperty(
+        name="Animation", description="Render the animation", default=False
+    )  # type: ignore
+
+    def execute(self, context):
+        # render_preはメインスレッド以外から呼ばれる場合があるため、
+        # 画像の作成と切り替えはレンダリングの開始前にここで行う
+        scene = context.scene
+        created = switch_border_variants(scene, use_full=True)
+        try:
+            result = bpy.ops.render.render("INVOKE_DEFAULT", animation=self.animation)
+        except Exception:
+            switch_border_variants(scene, use_full=False)
+            raise
+        if "CANCELLED" in result:
+            switch_border_variants(scene, use_full=False)
+            return {"CANCELLED"}
+        bpy.app.timers.register(
+            functools.partial(restore_proxy_borders, scene.name),
+            first_interval=RENDER_POLL_INTERVAL,
+        )
+        if created:
+            self.report({"INFO"}, f"フル解像度の枠線画像を作成: {created}")
+        return {"FINISHED"}
+
+
+class ResetStats(bpy.types.Operator):
+    bl_idname = "borderman.reset_stats"
+    bl_label = "Reset stats"
+    bl_description = "Reset the timings and counters of border generation."
+
+    def execute(self, context):
+        stats.get_stats().reset()
+        return {"FINISHED"}
+
+
+class ExportStats(bpy.types.Operator, ExportHelper):
+    bl_idname = "borderman.export_stats"
+    bl_label = "Export stats"
+    bl_description = "Export the timings and counters of border generation as JSON."
+
+    filename_ext = ".json"
+    filter_glob: bpy.props.StringProperty(
+        default="*.json", options={"HIDDEN"}
+    )  # type: ignore
+
+    def execute(self, context):
+        stats.get_stats().export_json(self.filepath)
+        self.report({"INFO"}, f"統計を出力: {self.filepath}")
+        return {"FINISHED"}
 
 
 class_list = [
     AddPlaceholder,
     ReplaceSelectedPlaceholdersToBorder,
     ReplaceAllPlaceholdersToBorder,
+    UpdateSelectedBorders,
+    UpdateAllBorders,
     DeleteUnusedBorderImages,
+    CreateFullResolutionBorders,
+    RenderWithFullResolutionBorders,
+    ResetStats,
+    ExportStats,
 ]
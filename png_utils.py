@@ -0,0 +1,259 @@
+# bpyに依存しないPNGエンコーダー
+#   GPUから読み出したUBYTEのRGBAバッファを直接PNGファイルに書き出す
+#   色数が少ない場合は、パレットPNGとして書き出せる
+import contextlib
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+COLOR_TYPE_PALETTE = 3
+COLOR_TYPE_RGBA = 6
+BIT_DEPTH_8 = 8
+FILTER_TYPE_NONE = b"\x00"
+DEFAULT_COMPRESS_LEVEL = 6
+# 出力形式
+PNG_MODE_RGBA = "RGBA"
+PNG_MODE_INDEXED = "INDEXED"
+# パレットPNGで扱う最大の色数(4bit)。これを超える場合はRGBAで書き出す
+MAX_PALETTE_COLORS = 16
+# IDATチャンクの最大サイズ
+IDAT_CHUNK_SIZE = 256 * 1024
+
+
+def _write_chunk(file, chunk_type: bytes, data: bytes = b""):
+    file.write(struct.pack(">I", len(data)))
+    file.write(chunk_type)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+class PngWriter:
+    """Streams scanlines into a PNG file through a zlib compressor."""
+
+    def __init__(
+        self,
+        file,
+        width,
+        height,
+        compress_level=DEFAULT_COMPRESS_LEVEL,
+        color_type=COLOR_TYPE_RGBA,
+        bit_depth=BIT_DEPTH_8,
+    ):
+        self.file = file
+        self.width = width
+        self.height = height
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        self._rows_written = 0
+
+        file.write(PNG_SIGNATURE)
+        ihdr = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+        _write_chunk(file, b"IHDR", ihdr)
+
+    def write_chunk(self, chunk_type: bytes, data: bytes):
+        # IHDRの後、IDATの前に置く補助チャンク(PLTE, tRNSなど)用
+        _write_chunk(self.file, chunk_type, data)
+
+    def write_row(self, row):
+        self._compress(FILTER_TYPE_NONE)
+        self._compress(row)
+        self._rows_written += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def _compress(self, data):
+        self._pending += self._compressor.compress(data)
+        while len(self._pending) >= IDAT_CHUNK_SIZE:
+            _write_chunk(self.file, b"IDAT", bytes(self._pending[:IDAT_CHUNK_SIZE]))
+            del self._pending[:IDAT_CHUNK_SIZE]
+
+    def close(self):
+        if self._rows_written != self.height:
+            raise ValueError(
+                f"expected {self.height} rows, but {self._rows_written} rows written"
+            )
+        self._pending += self._compressor.flush()
+        if self._pending:
+            _write_chunk(self.file, b"IDAT", bytes(self._pending))
+            self._pending.clear()
+        _write_chunk(self.file, b"IEND")
+
+
+def iter_rows(pixels, width, height, channels=4, bottom_up=True):
+    # GPUの読み出し結果は下の行から並んでいるため、PNG用に上の行から返す
+    view = memoryview(pixels).cast("B")
+    stride = width * channels
+    if len(view) != stride * height:
+        raise ValueError(
+            f"pixel buffer size mismatch: {len(view)} != {stride * height}"
+        )
+    row_indices = range(height - 1, -1, -1) if bottom_up else range(height)
+    for y in row_indices:
+        yield view[y * stride : (y + 1) * stride]
+
+
+@contextlib.contextmanager
+def atomic_write(output_path):
+    # 書き込み途中のファイルが出力パスに残らないよう、一時ファイル経由で置き換える
+    tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_png(
+    output_path,
+    pixels,
+    width,
+    height,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    bottom_up=True,
+):
+    with atomic_write(output_path) as f:
+        writer = PngWriter(f, width, height, compress_level=compress_level)
+        writer.write_rows(iter_rows(pixels, width, height, bottom_up=bottom_up))
+        writer.close()
+
+
+def build_palette(pixels, max_colors=MAX_PALETTE_COLORS):
+    # RGBAの色ごとにパレットの番号を割り当てる。色数が多すぎる場合はNone
+    #   枠線は枠線の色と透明の2色のみのため、色ごとの比較で十分に速い
+    packed = np.frombuffer(pixels, dtype=np.uint32)
+    colors = []
+    remaining = packed
+    while remaining.size:
+        if len(colors) == max_colors:
+            return None
+        colors.append(remaining[0])
+        remaining = remaining[remaining != remaining[0]]
+    indices = np.zeros(packed.size, dtype=np.uint8)
+    for i, color in enumerate(colors[1:], 1):
+        indices[packed == color] = i
+    palette = np.array(colors, dtype=np.uint32).view(np.uint8).reshape(-1, 4)
+    return palette, indices
+
+
+def get_palette_bit_depth(color_count):
+    for bit_depth in (1, 2, 4):
+        if color_count <= 1 << bit_depth:
+            return bit_depth
+    return BIT_DEPTH_8
+
+
+def pack_indices(indices, width, height, bit_depth):
+    # 1行ごとに、左のピクセルを上位ビットに詰める
+    rows = indices.reshape(height, width)
+    if bit_depth == BIT_DEPTH_8:
+        return rows
+    per_byte = 8 // bit_depth
+    padded = np.zeros((height, -(-width // per_byte) * per_byte), dtype=np.uint8)
+    padded[:, :width] = rows
+    shifts = (8 - bit_depth) - bit_depth * np.arange(per_byte, dtype=np.uint8)
+    groups = padded.reshape(height, -1, per_byte) << shifts
+    return np.bitwise_or.reduce(groups, axis=2)
+
+
+def write_indexed_png(
+    output_path,
+    pixels,
+    width,
+    height,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    bottom_up=True,
+):
+    # 透明度をtRNSチャンクで持つパレットPNGで書き出す
+    #   RGBAの1/32(2色の場合)の画素データになり、ファイルの作成と読み込みが速い
+    result = build_palette(pixels)
+    if result is None:
+        write_png(output_path, pixels, width, height, compress_level, bottom_up)
+        return
+    palette, indices = result
+    bit_depth = get_palette_bit_depth(len(palette))
+    rows = pack_indices(indices, width, height, bit_depth)
+    if bottom_up:
+        rows = rows[::-1]
+    with atomic_write(output_path) as f:
+        writer = PngWriter(
+            f,
+            width,
+            height,
+            compress_level=compress_level,
+            color_type=COLOR_TYPE_PALETTE,
+            bit_depth=bit_depth,
+        )
+        writer.write_chunk(b"PLTE", palette[:, :3].tobytes())
+        writer.write_chunk(b"tRNS", palette[:, 3].tobytes())
+        writer.write_rows(np.ascontiguousarray(rows))
+        writer.close()
+
+
+def write_png_rows(
+    output_path,
+    rows,
+    width,
+    height,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    mode=PNG_MODE_RGBA,
+    palette=None,
+):
+    # 上の行から順に渡される(width, 4)のRGBAの行を、1行ずつ圧縮して書き出す
+    #   画像全体をメモリに保持しないため、画像のサイズによらずメモリ使用量が一定
+    #   パレットPNGの場合は、paletteに画像に含まれるすべての色(RGBA)を指定する
+    indexed = mode == PNG_MODE_INDEXED and palette is not None
+    with atomic_write(output_path) as f:
+        if indexed:
+            palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 4)
+            bit_depth = get_palette_bit_depth(len(palette))
+            writer = PngWriter(
+                f,
+                width,
+                height,
+                compress_level=compress_level,
+                color_type=COLOR_TYPE_PALETTE,
+                bit_depth=bit_depth,
+            )
+            writer.write_chunk(b"PLTE", palette[:, :3].tobytes())
+            writer.write_chunk(b"tRNS", palette[:, 3].tobytes())
+            colors = np.ascontiguousarray(palette).view(np.uint32).reshape(-1)
+            order = np.argsort(colors)
+            sorted_colors = colors[order]
+        else:
+            writer = PngWriter(f, width, height, compress_level=compress_level)
+        for y, row in enumerate(rows):
+            row = np.ascontiguousarray(row)
+            if indexed:
+                packed = row.view(np.uint32).reshape(-1)
+                found = np.searchsorted(sorted_colors, packed)
+                found[found == len(sorted_colors)] = 0
+                # ヘッダーは書き出し済みのため、パレットに無い色は例外にする
+                #   (atomic_writeにより、出力パスにファイルは残らない)
+                if not (sorted_colors[found] == packed).all():
+                    raise ValueError(f"row {y} has a color that is not in the palette")
+                indices = order[found].astype(np.uint8)
+                row = pack_indices(indices, width, 1, bit_depth)
+            writer.write_row(row)
+        writer.close()
+
+
+def write_png_mode(
+    output_path,
+    pixels,
+    width,
+    height,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    mode=PNG_MODE_RGBA,
+):
+    if mode == PNG_MODE_INDEXED:
+        write_indexed_png(output_path, pixels, width, height, compress_level)
+    else:
+        write_png(output_path, pixels, width, height, compress_level)
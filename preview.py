@@ -0,0 +1,146 @@
+# シーケンサーのプレビューに、placeholderの枠線を直接描画する
+#   枠線画像(PNG)を作成せずに、枠線の色/サイズ/角の丸みを確認するために使う
+import bpy
+from bpy.app.handlers import persistent
+import gpu
+from . import ops
+from . import shader_utils
+from . import utils
+
+_draw_handle = None
+
+
+def is_enabled():
+    return _draw_handle is not None
+
+
+def enable():
+    global _draw_handle
+    if _draw_handle is None:
+        _draw_handle = bpy.types.SpaceSequenceEditor.draw_handler_add(
+            draw_border_preview, (), "PREVIEW", "POST_PIXEL"
+        )
+    if on_render_pre not in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.append(on_render_pre)
+    tag_redraw()
+
+
+def disable():
+    global _draw_handle
+    if _draw_handle is not None:
+        bpy.types.SpaceSequenceEditor.draw_handler_remove(_draw_handle, "PREVIEW")
+        _draw_handle = None
+    if on_render_pre in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.remove(on_render_pre)
+    tag_redraw()
+
+
+def tag_redraw():
+    wm = bpy.context.window_manager
+    if wm is None:
+        return
+    for window in wm.windows:
+        for area in window.screen.areas:
+            if area.type == "SEQUENCE_EDITOR":
+                area.tag_redraw()
+
+
+def get_visible_placeholders(scene: bpy.types.Scene):
+    frame = scene.frame_current
+    placeholders = [
+        strip
+        for strip in ops.get_indexed_strips(
+            scene, ops.STRIP_TYPE_PLACEHOLDER, top_level_only=True
+        )
+        if not strip.mute and strip.frame_final_start <= frame < strip.frame_final_end
+    ]
+    # 上のチャンネルの枠線を後から描画する
+    placeholders.sort(key=lambda strip: strip.channel)
+    return placeholders
+
+
+def draw_border_preview():
+    context = bpy.context
+    scene = context.scene
+    if not scene.sequence_editor:
+        return
+    props = scene.borderman_props
+    placeholders = get_visible_placeholders(scene)
+    if not placeholders:
+        return
+
+    view2d = context.region.view2d
+    screen_rect = utils.get_screen_rect(utils.FULL_RESOLUTION_PERCENTAGE)
+    viewport = gpu.state.viewport_get()
+    gpu.state.blend_set("ALPHA")
+    try:
+        for strip in placeholders:
+            # 現在のフレームの位置とサイズ(キーフレームの評価済みの値)を使う
+            rect = utils.get_placeholder_info(strip)
+            border_rect = utils.get_border_rect(rect, props.border_size)
+            # 枠線画像と同じく、スクリーンの中央を原点とした座標に配置する
+            center_x, center_y = utils.get_border_offset(rect, screen_rect)
+            x0, y0 = view2d.view_to_region(
+                center_x - border_rect.w / 2, center_y - border_rect.h / 2, clip=False
+            )
+            x1, y1 = view2d.view_to_region(
+                center_x + border_rect.w / 2, center_y + border_rect.h / 2, clip=False
+            )
+            if x1 <= x0 or y1 <= y0:
+                continue
+            # 枠線のシェーダーはビューポート全体に描画するため、枠線の範囲に合わせる
+            #   SDFは枠線画像のピクセル単位で評価するため、ズームしても形は変わらない
+            gpu.state.viewport_set(x0, y0, x1 - x0, y1 - y0)
+            if props.shape_type == shader_utils.SHAPE_TYPE_RECTANGLE:
+                shader_utils.draw_rounded_rectagle_border(
+                    border_rect,
+                    props.border_color,
+                    props.border_size,
+                    props.corner_radius,
+                )
+            else:
+                shader_utils.draw_ellipse_border(
+                    border_rect, props.border_color, props.border_size
+                )
+    finally:
+        gpu.state.viewport_set(*viewport)
+        gpu.state.blend_set("NONE")
+
+
+@persistent
+def on_render_pre(scene, *args):
+    # レンダリングはプレビューの枠線を含まないため、焼き込み忘れを知らせる
+    #   render_preはメインスレッド以外から呼ばれる場合があり、
+    #   GPUでの描画やストリップの変更を行えないため、ここでは置き換えない
+    if not scene.sequence_editor:
+        return
+    placeholders = ops.get_indexed_strips(scene, ops.STRIP_TYPE_PLACEHOLDER)
+    if placeholders:
+        print(
+            f"borderman: {len(placeholders)} placeholder(s) in '{scene.name}' "
+            "are not replaced with border images"
+        )
+
+
+class ToggleBorderPreview(bpy.types.Operator):
+    bl_idname = "borderman.toggle_border_preview"
+    bl_label = "Preview borders"
+    bl_description = (
+        "Draw borders of placeholders in the preview without creating border images."
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.space_data.view_type == "SEQUENCER"
+
+    def execute(self, context):
+        if is_enabled():
+            disable()
+        else:
+            enable()
+        return {"FINISHED"}
+
+
+class_list = [
+    ToggleBorderPreview,
+]
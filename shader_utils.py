@@ -1,6 +1,8 @@
 import gpu
 from gpu_extras.batch import batch_for_shader
 from dataclasses import dataclass
+import numpy as np
+from . import stats
 
 
 @dataclass(frozen=True)
@@ -12,18 +14,12 @@ class OffscreenInfo:
 
 
 def get_offscreen_info(border_rect):
-    screen_size = max(border_rect.w, border_rect.h)
-    diff_of_size = abs(border_rect.w - border_rect.h)
-    if diff_of_size % 2 != 0:
-        screen_size += 1
-
-    screen_offset = (0, 0)
-    if border_rect.w > border_rect.h:
-        screen_offset = (0, round((screen_size - border_rect.h) / 2))
-    elif border_rect.w < border_rect.h:
-        screen_offset = (round((screen_size - border_rect.w) / 2), 0)
-
-    return OffscreenInfo(screen_size, screen_size, screen_offset[0], screen_offset[1])
+    # 枠線と同じサイズのオフスクリーンに描画する
+    #   SDFはピクセル単位で評価するため、縦横比の補正は不要
+    #   以前は正方形のオフスクリーンに描画していたため、長辺が奇数のサイズでは
+    #   半ピクセルずれた位置で評価していた。現在は常に枠線の中心で評価する
+    #   (tests/test_shader_utils.pyで以前の描画結果と比較している)
+    return OffscreenInfo(border_rect.w, border_rect.h, 0, 0)
 
 
 def ellipse_border_shader():
@@ -32,6 +28,8 @@ def ellipse_border_shader():
 
     shader_info = gpu.types.GPUShaderCreateInfo()
     shader_info.push_constant("VEC2", "boxSize")
+    shader_info.push_constant("VEC2", "tileHalfSize")
+    shader_info.push_constant("VEC2", "tileCenter")
     shader_info.push_constant("VEC4", "borderColor")
     shader_info.push_constant("FLOAT", "borderSize")
     shader_info.vertex_in(0, "VEC3", "position")
@@ -75,7 +73,8 @@ def ellipse_border_shader():
         return (dot(p/ab,p/ab)>1.0) ? d : -d;
     }
     void main() {
-      float d = sdEllipse(pos.xy, boxSize);
+      // 枠線の中心を原点としたピクセル座標(タイルごとに描画する場合はタイルの位置を加える)
+      float d = sdEllipse(pos.xy * tileHalfSize + tileCenter, boxSize);
       if (-borderSize <= d && d <= 0) {
         FragColor = borderColor;
       } else {
@@ -96,6 +95,8 @@ def rounded_rectagle_border_shader():
 
     shader_info = gpu.types.GPUShaderCreateInfo()
     shader_info.push_constant("VEC2", "boxSize")
+    shader_info.push_constant("VEC2", "tileHalfSize")
+    shader_info.push_constant("VEC2", "tileCenter")
     shader_info.push_constant("VEC4", "borderColor")
     shader_info.push_constant("FLOAT", "borderSize")
     shader_info.push_constant("FLOAT", "cornerRadius")
@@ -119,7 +120,8 @@ def rounded_rectagle_border_shader():
         return length(max(d, 0.0)) + min(max(d.x, d.y), 0.0) - r;
     }
     void main() {
-      float d = sdBox(pos.xy, boxSize, cornerRadius);
+      // 枠線の中心を原点としたピクセル座標(タイルごとに描画する場合はタイルの位置を加える)
+      float d = sdBox(pos.xy * tileHalfSize + tileCenter, boxSize, cornerRadius);
       if ( -borderSize <= d && d <= 0) {
         FragColor = borderColor;
       } else {
@@ -134,59 +136,308 @@ def rounded_rectagle_border_shader():
     return shader
 
 
-def draw_rounded_rectagle_border(border_rect, border_color, border_size, corner_radius):
-    offscreen_rect = get_offscreen_info(border_rect)
-    with gpu.matrix.push_pop():
-        shader = rounded_rectagle_border_shader()
+# 複数の枠線を1つのオフスクリーンにまとめて描画する際の1回の描画あたりの最大数
+MAX_ATLAS_INSTANCES = 64
+# アトラス用のUBOでの形状の値
+ATLAS_SHAPE_RECTANGLE = 0.0
+ATLAS_SHAPE_ELLIPSE = 1.0
+
+
+def atlas_border_shader():
+    vert_out = gpu.types.GPUStageInterfaceInfo("atlas_border")
+    vert_out.smooth("VEC2", "localPos")
+    vert_out.flat("INT", "instanceIndex")
+
+    shader_info = gpu.types.GPUShaderCreateInfo()
+    # rects: アトラス内の位置とサイズ(x, y, w, h) [px]
+    # params: (borderSize, cornerRadius, shape, 未使用) [px]
+    shader_info.typedef_source(
+        "struct BorderInstances {"
+        f"  vec4 rects[{MAX_ATLAS_INSTANCES}];"
+        f"  vec4 params[{MAX_ATLAS_INSTANCES}];"
+        f"  vec4 colors[{MAX_ATLAS_INSTANCES}];"
+        "};"
+    )
+    shader_info.uniform_buf(0, "BorderInstances", "instances")
+    shader_info.push_constant("VEC2", "atlasSize")
+    shader_info.vertex_in(0, "VEC2", "position")
+    shader_info.vertex_out(vert_out)
+    shader_info.fragment_out(0, "VEC4", "FragColor")
+
+    shader_info.vertex_source(
+        "void main() "
+        "{"
+        "  vec4 rect = instances.rects[gpu_InstanceIndex];"
+        "  instanceIndex = gpu_InstanceIndex;"
+        # 枠線の中心を原点としたピクセル座標
+        "  localPos = (position - 0.5) * rect.zw;"
+        "  vec2 atlasPos = rect.xy + position * rect.zw;"
+        "  gl_Position = vec4(atlasPos / atlasSize * 2.0 - 1.0, 0.0, 1.0);"
+        "}"
+    )
+
+    shader_info.fragment_source(
+        """
+    // from https://iquilezles.org/articles/distfunctions2d/
+    float sdBox(in vec2 p, in vec2 b, in float r) {
+        vec2 d = abs(p) - b + r;
+        return length(max(d, 0.0)) + min(max(d.x, d.y), 0.0) - r;
+    }
+    // from https://iquilezles.org/articles/ellipsedist/
+    float sdEllipse(in vec2 p, in vec2 ab) {
+        // symmetry
+        p = abs( p );
+
+        // initial value
+        vec2 q = ab*(p-ab);
+        vec2 cs = normalize( (q.x<q.y) ? vec2(0.01,1) : vec2(1,0.01) );
+
+        // find root with Newton solver
+        for( int i=0; i<5; i++ )
+        {
+            vec2 u = ab*vec2( cs.x,cs.y);
+            vec2 v = ab*vec2(-cs.y,cs.x);
+            float a = dot(p-u,v);
+            float c = dot(p-u,u) + dot(v,v);
+            float b = sqrt(c*c-a*a);
+            cs = vec2( cs.x*b-cs.y*a, cs.y*b+cs.x*a )/c;
+        }
+
+        // compute final point and distance
+        float d = length(p-ab*cs);
+
+        // return signed distance
+        return (dot(p/ab,p/ab)>1.0) ? d : -d;
+    }
+    void main() {
+      vec4 rect = instances.rects[instanceIndex];
+      vec4 params = instances.params[instanceIndex];
+      vec2 halfSize = rect.zw * 0.5;
+      float d = (params.z < 0.5)
+        ? sdBox(localPos, halfSize, params.y)
+        : sdEllipse(localPos, halfSize);
+      if (-params.x <= d && d <= 0) {
+        FragColor = instances.colors[instanceIndex];
+      } else {
+        FragColor = vec4(vec3(0.0), 0.0);
+      }
+    }
+    """
+    )
+    shader = gpu.shader.create_from_info(shader_info)
+    del vert_out
+    del shader_info
+    return shader
+
+
+SHAPE_TYPE_RECTANGLE = "rectangle"
+SHAPE_TYPE_ELLIPSE = "Ellipse"
+SHADER_KEY_ATLAS = "atlas"
+
+# 形状ごとにコンパイル済みのシェーダーと描画用バッチをキャッシュする
+_shader_cache = {}
+_batch_cache = {}
+
+_shader_factories = {
+    SHAPE_TYPE_RECTANGLE: rounded_rectagle_border_shader,
+    SHAPE_TYPE_ELLIPSE: ellipse_border_shader,
+    SHADER_KEY_ATLAS: atlas_border_shader,
+}
+
+_FULL_SCREEN_QUAD = [
+    [-1.0, -1.0],
+    [1.0, -1.0],
+    [1.0, 1.0],
+    [-1.0, -1.0],
+    [1.0, 1.0],
+    [-1.0, 1.0],
+]
+_UNIT_QUAD = [
+    [0.0, 0.0],
+    [1.0, 0.0],
+    [1.0, 1.0],
+    [0.0, 0.0],
+    [1.0, 1.0],
+    [0.0, 1.0],
+]
+_batch_positions = {
+    SHADER_KEY_ATLAS: _UNIT_QUAD,
+}
+
+
+def _normalize_shape_type(shape_type):
+    if shape_type in _shader_factories:
+        return shape_type
+    return SHAPE_TYPE_ELLIPSE
+
+
+def get_border_shader(shape_type):
+    key = _normalize_shape_type(shape_type)
+    shader = _shader_cache.get(key)
+    if shader is None:
+        with stats.stage(stats.STAGE_SHADER_BUILD):
+            shader = _shader_factories[key]()
+        _shader_cache[key] = shader
+    return shader
+
+
+def get_border_batch(shape_type):
+    key = _normalize_shape_type(shape_type)
+    batch = _batch_cache.get(key)
+    if batch is None:
         batch = batch_for_shader(
-            shader,
+            get_border_shader(key),
             "TRIS",
-            {
-                "position": [
-                    [-1.0, -1.0],
-                    [1.0, -1.0],
-                    [1.0, 1.0],
-                    [-1.0, -1.0],
-                    [1.0, 1.0],
-                    [-1.0, 1.0],
-                ]
-            },
-        )
-        shader.uniform_float(
-            "boxSize",
-            (border_rect.w / offscreen_rect.w, border_rect.h / offscreen_rect.h),
+            {"position": _batch_positions.get(key, _FULL_SCREEN_QUAD)},
         )
+        _batch_cache[key] = batch
+    return batch
+
+
+def warm_up_shaders():
+    for shape_type in _shader_factories:
+        get_border_batch(shape_type)
+
+
+def free_shader_cache():
+    # バッチはシェーダーを参照するため先に解放する
+    _batch_cache.clear()
+    _shader_cache.clear()
+
+
+def _set_tile_uniforms(shader, border_rect, tile):
+    # tile: ビューポートに描画する範囲(x, y, w, h)。枠線画像の左下を原点としたピクセル単位
+    if tile is None:
+        tile = (0, 0, border_rect.w, border_rect.h)
+    x, y, w, h = tile
+    shader.uniform_float("tileHalfSize", (w / 2, h / 2))
+    shader.uniform_float(
+        "tileCenter",
+        (x + (w - border_rect.w) / 2, y + (h - border_rect.h) / 2),
+    )
+
+
+def draw_rounded_rectagle_border(
+    border_rect, border_color, border_size, corner_radius, tile=None
+):
+    # boxSize, borderSize, cornerRadiusはピクセル単位
+    with gpu.matrix.push_pop():
+        shader = get_border_shader(SHAPE_TYPE_RECTANGLE)
+        batch = get_border_batch(SHAPE_TYPE_RECTANGLE)
+        shader.bind()
+        shader.uniform_float("boxSize", (border_rect.w / 2, border_rect.h / 2))
+        _set_tile_uniforms(shader, border_rect, tile)
         shader.uniform_float("borderColor", border_color)
-        shader.uniform_float("borderSize", border_size / (offscreen_rect.w / 2))
-        shader.uniform_float(
-            "cornerRadius",
-            corner_radius / offscreen_rect.w,
-        )
+        shader.uniform_float("borderSize", border_size)
+        # 角の丸みは従来のオフスクリーンでの描画(1/2スケール)と合わせる
+        shader.uniform_float("cornerRadius", corner_radius / 2)
         batch.draw(shader)
 
 
-def draw_ellipse_border(border_rect, border_color, border_size):
-    offscreen_rect = get_offscreen_info(border_rect)
+def draw_ellipse_border(border_rect, border_color, border_size, tile=None):
+    # boxSize, borderSizeはピクセル単位
     with gpu.matrix.push_pop():
-        shader = ellipse_border_shader()
-        batch = batch_for_shader(
-            shader,
-            "TRIS",
-            {
-                "position": [
-                    [-1.0, -1.0],
-                    [1.0, -1.0],
-                    [1.0, 1.0],
-                    [-1.0, -1.0],
-                    [1.0, 1.0],
-                    [-1.0, 1.0],
-                ]
-            },
-        )
-        shader.uniform_float(
-            "boxSize",
-            (border_rect.w / offscreen_rect.w, border_rect.h / offscreen_rect.h),
-        )
+        shader = get_border_shader(SHAPE_TYPE_ELLIPSE)
+        batch = get_border_batch(SHAPE_TYPE_ELLIPSE)
+        shader.bind()
+        shader.uniform_float("boxSize", (border_rect.w / 2, border_rect.h / 2))
+        _set_tile_uniforms(shader, border_rect, tile)
         shader.uniform_float("borderColor", border_color)
-        shader.uniform_float("borderSize", border_size / (offscreen_rect.w / 2))
+        shader.uniform_float("borderSize", border_size)
         batch.draw(shader)
+
+
+@dataclass(frozen=True)
+class AtlasPlacement:
+    index: int
+    x: int
+    y: int
+    w: int
+    h: int
+
+
+@dataclass(frozen=True)
+class AtlasPage:
+    w: int
+    h: int
+    placements: tuple
+
+
+# アトラス内の枠線同士の間隔(px)
+ATLAS_PADDING = 1
+
+
+def get_max_atlas_size(limit=4096):
+    return min(limit, gpu.capabilities.max_texture_size_get())
+
+
+def pack_atlas(sizes, atlas_size):
+    """Shelf-packs (w, h) sizes into atlas pages.
+
+    Returns the pages and the indices of sizes that do not fit in a page.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True)
+    pages = []
+    oversized = []
+    placements = []
+    shelf_x = shelf_y = shelf_h = page_w = page_h = 0
+
+    def close_page():
+        # 段を進めた後のshelf_yは余白を含むため、配置済みの範囲の高さを使う
+        if placements:
+            pages.append(AtlasPage(page_w, page_h, tuple(placements)))
+
+    for i in order:
+        w, h = sizes[i]
+        if w > atlas_size or h > atlas_size:
+            oversized.append(i)
+            continue
+        if shelf_x + w > atlas_size:
+            # 次の段へ
+            shelf_x = 0
+            shelf_y += shelf_h + ATLAS_PADDING
+            shelf_h = 0
+        if shelf_y + h > atlas_size:
+            # 次のページへ
+            close_page()
+            placements = []
+            shelf_x = shelf_y = shelf_h = page_w = page_h = 0
+        placements.append(AtlasPlacement(i, shelf_x, shelf_y, w, h))
+        shelf_x += w + ATLAS_PADDING
+        shelf_h = max(shelf_h, h)
+        page_w = max(page_w, shelf_x - ATLAS_PADDING)
+        page_h = max(page_h, shelf_y + h)
+    close_page()
+    return pages, oversized
+
+
+def draw_border_atlas(page: AtlasPage, styles):
+    """Draws every border of an atlas page with instanced quads.
+
+    ``styles`` maps a placement index to
+    ``(shape_type, border_color, border_size, corner_radius)``.
+    """
+    shader = get_border_shader(SHADER_KEY_ATLAS)
+    batch = get_border_batch(SHADER_KEY_ATLAS)
+    with gpu.matrix.push_pop():
+        shader.bind()
+        shader.uniform_float("atlasSize", (page.w, page.h))
+        placements = page.placements
+        for start in range(0, len(placements), MAX_ATLAS_INSTANCES):
+            chunk = placements[start : start + MAX_ATLAS_INSTANCES]
+            data = np.zeros((3, MAX_ATLAS_INSTANCES, 4), dtype=np.float32)
+            for n, p in enumerate(chunk):
+                shape_type, border_color, border_size, corner_radius = styles[p.index]
+                is_rectangle = shape_type == SHAPE_TYPE_RECTANGLE
+                data[0, n] = (p.x, p.y, p.w, p.h)
+                # 角の丸みは単体描画時と合わせる
+                data[1, n] = (
+                    border_size,
+                    corner_radius / 2,
+                    ATLAS_SHAPE_RECTANGLE if is_rectangle else ATLAS_SHAPE_ELLIPSE,
+                    0.0,
+                )
+                data[2, n] = border_color
+            ubo = gpu.types.GPUUniformBuf(data.tobytes())
+            shader.uniform_block("instances", ubo)
+            batch.draw_instanced(shader, instance_count=len(chunk))
@@ -0,0 +1,94 @@
+# 枠線画像生成の段階ごとの処理時間とカウンターを集計する
+#   PNGの書き込みスレッドからも記録するため、ロックで保護する
+import contextlib
+import json
+import threading
+import time
+
+STAGE_SHADER_BUILD = "shader_build"
+STAGE_RENDER = "render"
+STAGE_READBACK = "readback"
+STAGE_PNG_SAVE = "png_save"
+STAGE_STRIP_CREATION = "strip_creation"
+STAGE_REPLACE = "replace"
+
+COUNTER_BORDERS_RENDERED = "borders_rendered"
+COUNTER_BYTES_WRITTEN = "bytes_written"
+COUNTER_CACHE_HITS = "cache_hits"
+COUNTER_STRIPS_CREATED = "strips_created"
+
+
+class Stats:
+    """Aggregates per-stage timings and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 描画の直後にGPUの完了を待ち、描画時間にGPUの処理時間を含める
+        self.sync_gpu = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # 段階名 -> [回数, 合計時間, 最大時間]
+            self._stages = {}
+            self._counters = {}
+            self._started = time.time()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "since": self._started,
+                "stages": {
+                    name: {"count": count, "total": total, "max": max_time}
+                    for name, (count, total, max_time) in self._stages.items()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def format_lines(self):
+        data = self.to_dict()
+        lines = [
+            f"{name}: {s['total']:.3f}s / {s['count']} (max {s['max']:.3f}s)"
+            for name, s in data["stages"].items()
+        ]
+        lines += [f"{name}: {value}" for name, value in data["counters"].items()]
+        return lines
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+# アドオン全体で共有する集計
+_stats = Stats()
+
+
+def get_stats() -> Stats:
+    return _stats
+
+
+def stage(name):
+    return _stats.stage(name)
+
+
+def count(name, n=1):
+    _stats.count(name, n)
@@ -0,0 +1,40 @@
+# Blenderの外でテストを実行するための準備
+#   アドオンの__init__.pyはbpyを必要とするため実行せず、
+#   `borderman`パッケージとして各モジュールのみを読み込めるようにする
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "borderman"
+
+
+def _install_package():
+    if PACKAGE_NAME in sys.modules:
+        return
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ROOT]
+    package.__file__ = os.path.join(ROOT, "__init__.py")
+    sys.modules[PACKAGE_NAME] = package
+    # pytestはリポジトリのディレクトリ名でもパッケージ(__init__.py)を読み込むため、
+    # 同じモジュールを登録しておく
+    sys.modules.setdefault(os.path.basename(ROOT), package)
+
+
+def _install_gpu_modules():
+    # shader_utilsはimport時にgpuを参照する。GPUを使う関数はテストしないため、
+    # Blender以外では空のモジュールを登録する
+    try:
+        import gpu  # noqa: F401
+    except ImportError:
+        gpu_extras = types.ModuleType("gpu_extras")
+        batch = types.ModuleType("gpu_extras.batch")
+        batch.batch_for_shader = None
+        gpu_extras.batch = batch
+        sys.modules["gpu"] = types.ModuleType("gpu")
+        sys.modules["gpu_extras"] = gpu_extras
+        sys.modules["gpu_extras.batch"] = batch
+
+
+_install_package()
+_install_gpu_modules()
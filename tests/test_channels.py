@@ -0,0 +1,109 @@
+import random
+import types
+
+from borderman import channels
+
+
+def make_strip(channel, frame_start, frame_end):
+    return types.SimpleNamespace(
+        channel=channel, frame_final_start=frame_start, frame_final_end=frame_end
+    )
+
+
+def find_free_channel_reference(intervals, frame_start, frame_end, target_channel):
+    # 全ての区間と半開区間[start, end)の重なりを調べる
+    for channel in range(target_channel, channels.MAX_CHANNEL + 1):
+        if all(
+            c != channel or not (s < frame_end and frame_start < e)
+            for c, s, e in intervals
+        ):
+            return channel
+    return None
+
+
+def random_layout(rng, channel_count=6, length=200):
+    # チャンネルごとに重ならない区間(隣接を含む)
+    intervals = []
+    for channel in range(1, channel_count + 1):
+        frame = rng.randint(0, 10)
+        while frame < length:
+            end = frame + rng.randint(1, 30)
+            intervals.append((channel, frame, end))
+            frame = end + rng.choice([0, 0, rng.randint(1, 20)])
+    return intervals
+
+
+def assert_matches_reference(allocator, intervals, rng, queries=30):
+    for _ in range(queries):
+        frame_start = rng.randint(-5, 220)
+        frame_end = frame_start + rng.randint(1, 40)
+        target_channel = rng.randint(1, 8)
+        query = (frame_start, frame_end, target_channel)
+        expected = find_free_channel_reference(intervals, *query)
+        assert allocator.find_free_channel(*query) == expected, query
+
+
+def test_half_open_boundaries():
+    allocator = channels.ChannelAllocator([make_strip(1, 10, 20)])
+    # 終了フレームから始まる区間、開始フレームで終わる区間は重ならない
+    assert allocator.find_free_channel(20, 30, 1) == 1
+    assert allocator.find_free_channel(0, 10, 1) == 1
+    assert allocator.find_free_channel(19, 21, 1) == 2
+    assert allocator.find_free_channel(9, 11, 1) == 2
+    assert allocator.find_free_channel(12, 15, 1) == 2
+
+
+def test_no_free_channel():
+    allocator = channels.ChannelAllocator(
+        [make_strip(c, 0, 10) for c in range(1, channels.MAX_CHANNEL + 1)]
+    )
+    assert allocator.find_free_channel(5, 6, 1) is None
+    assert allocator.find_free_channel(10, 20, 1) == 1
+
+
+def test_matches_reference_on_random_layouts():
+    rng = random.Random(0)
+    for _ in range(500):
+        intervals = random_layout(rng)
+        rng.shuffle(intervals)
+        allocator = channels.ChannelAllocator(make_strip(*i) for i in intervals)
+        assert_matches_reference(allocator, intervals, rng)
+
+
+def test_reserve_and_release_match_reference():
+    rng = random.Random(1)
+    for _ in range(200):
+        intervals = random_layout(rng)
+        allocator = channels.ChannelAllocator()
+        current = []
+        for interval in intervals:
+            if rng.random() < 0.5:
+                allocator.reserve(*interval)
+            else:
+                allocator.reserve_many([interval])
+            current.append(interval)
+        rng.shuffle(current)
+        for _ in range(len(current) // 3):
+            interval = current.pop()
+            allocator.release(*interval)
+        assert_matches_reference(allocator, current, rng)
+
+
+def test_reserve_many_and_release_many_match_reference():
+    rng = random.Random(2)
+    for _ in range(200):
+        intervals = random_layout(rng)
+        rng.shuffle(intervals)
+        half = len(intervals) // 2
+        allocator = channels.ChannelAllocator(make_strip(*i) for i in intervals[:half])
+        allocator.reserve_many(intervals[half:])
+        assert_matches_reference(allocator, intervals, rng)
+
+        removed = rng.sample(intervals, len(intervals) // 3)
+        allocator.release_many(removed)
+        remaining = [i for i in intervals if i not in removed]
+        assert_matches_reference(allocator, remaining, rng)
+
+        # 解放した区間を、同じ区間の再登録を含めて戻す
+        allocator.reserve_many(removed)
+        assert_matches_reference(allocator, intervals, rng)
@@ -0,0 +1,182 @@
+import random
+
+import numpy as np
+import pytest
+
+from borderman import cpu_render
+
+COLOR = (1.0, 0.0, 0.0, 1.0)
+# 比較する枠線(形状, 幅, 高さ, 枠線の太さ, 角の丸み)
+REFERENCE_CASES = (
+    ("rectangle", 41, 23, 3, 0),
+    ("rectangle", 64, 48, 6, 30),
+    ("rectangle", 33, 90, 8, 120),
+    ("rectangle", 7, 5, 2, 4),
+    ("Ellipse", 41, 23, 3, 0),
+    ("Ellipse", 120, 40, 6, 0),
+    ("Ellipse", 31, 77, 5, 0),
+)
+
+
+def pixel_centers(w, h, dtype=np.float32):
+    # シェーダーと同じく、枠線の中心を原点としたピクセルの中心の座標
+    xs = (np.arange(w, dtype=dtype) + dtype(0.5)) - dtype(w / 2)
+    ys = (np.arange(h, dtype=dtype) + dtype(0.5)) - dtype(h / 2)
+    return np.meshgrid(xs, ys)
+
+
+def sdf_mask(shape_type, w, h, border_size, corner_radius):
+    # cpu_renderのSDF(float32)での枠線のマスク。行は下から並ぶ
+    px, py = pixel_centers(w, h)
+    if shape_type == cpu_render.SHAPE_TYPE_RECTANGLE:
+        d = cpu_render.sd_box(
+            px, py, np.float32(w / 2), np.float32(h / 2), np.float32(corner_radius / 2)
+        )
+    else:
+        d = cpu_render.sd_ellipse(px, py, np.float32(w / 2), np.float32(h / 2))
+    return (-border_size <= d) & (d <= 0)
+
+
+def rendered_mask(shape_type, w, h, border_size, corner_radius):
+    pixels = cpu_render.render_border_pixels(
+        w, h, shape_type, border_size, COLOR, corner_radius
+    )
+    return pixels.reshape(h, w, 4)[:, :, 3] > 0
+
+
+def sd_box_reference(px, py, half_w, half_h, r):
+    # float64での角丸の矩形までの距離
+    dx = np.abs(px) - half_w + r
+    dy = np.abs(py) - half_h + r
+    outside = np.hypot(np.maximum(dx, 0.0), np.maximum(dy, 0.0))
+    return outside + np.minimum(np.maximum(dx, dy), 0.0) - r
+
+
+def sd_ellipse_reference(px, py, a, b, samples=4000):
+    # 楕円上の点を細かく取り、最も近い点までの距離を求める(float64)
+    #   cpu_renderのニュートン法とは独立した方法で求める
+    px = np.abs(np.asarray(px, dtype=np.float64)).reshape(-1)
+    py = np.abs(np.asarray(py, dtype=np.float64)).reshape(-1)
+    t = np.linspace(0.0, np.pi / 2, samples)
+    ex = a * np.cos(t)
+    ey = b * np.sin(t)
+    d = np.empty_like(px)
+    for i in range(0, len(px), 256):
+        d[i : i + 256] = np.min(
+            np.hypot(px[i : i + 256, None] - ex, py[i : i + 256, None] - ey), axis=1
+        )
+    outside = (px / a) ** 2 + (py / b) ** 2 > 1.0
+    return np.where(outside, d, -d)
+
+
+def reference_mask(shape_type, w, h, border_size, corner_radius):
+    # float64の参照実装での枠線のマスクと、誤差で判定が分かれうるピクセル
+    px, py = pixel_centers(w, h, dtype=np.float64)
+    if shape_type == cpu_render.SHAPE_TYPE_RECTANGLE:
+        d = sd_box_reference(px, py, w / 2, h / 2, corner_radius / 2)
+        tolerance = 1e-3
+    else:
+        d = sd_ellipse_reference(px, py, w / 2, h / 2).reshape(h, w)
+        tolerance = 0.05
+    mask = (-border_size <= d) & (d <= 0)
+    ambiguous = (np.abs(d) < tolerance) | (np.abs(d + border_size) < tolerance)
+    return mask, ambiguous
+
+
+def assert_matches_reference(mask, case):
+    expected, ambiguous = reference_mask(*case)
+    # 境界上のピクセル以外は一致し、境界上のピクセルはわずかであること
+    assert ambiguous.mean() < 0.05, case
+    np.testing.assert_array_equal(mask[~ambiguous], expected[~ambiguous], str(case))
+
+
+def test_sd_box_matches_reference():
+    rng = random.Random(0)
+    for _ in range(2000):
+        half_w = rng.uniform(1, 500)
+        half_h = rng.uniform(1, 500)
+        r = rng.uniform(0, min(half_w, half_h))
+        px = rng.uniform(-1.5 * half_w, 1.5 * half_w)
+        py = rng.uniform(-1.5 * half_h, 1.5 * half_h)
+        d = cpu_render.sd_box(
+            np.float32(px),
+            np.float32(py),
+            np.float32(half_w),
+            np.float32(half_h),
+            np.float32(r),
+        )
+        assert d == pytest.approx(sd_box_reference(px, py, half_w, half_h, r), abs=1e-3)
+
+
+def test_sd_ellipse_matches_reference_near_border():
+    # 枠線の描画に使う、輪郭付近の距離を比較する
+    rng = random.Random(1)
+    for _ in range(300):
+        a = rng.uniform(5, 400)
+        b = rng.uniform(5, 400)
+        angle = rng.uniform(0, 2 * np.pi)
+        offset = rng.uniform(-40, 5)
+        px = (a + offset) * np.cos(angle)
+        py = (b + offset) * np.sin(angle)
+        d = cpu_render.sd_ellipse(
+            np.float32(px), np.float32(py), np.float32(a), np.float32(b)
+        )
+        expected = sd_ellipse_reference(px, py, a, b, samples=50000)[0]
+        assert float(d) == pytest.approx(expected, abs=0.05)
+
+
+@pytest.mark.parametrize("case", REFERENCE_CASES, ids=str)
+def test_render_matches_reference(case):
+    assert_matches_reference(rendered_mask(*case), case)
+
+
+def test_render_matches_reference_random():
+    rng = random.Random(3)
+    for _ in range(20):
+        shape_type = rng.choice([cpu_render.SHAPE_TYPE_RECTANGLE, "Ellipse"])
+        case = (
+            shape_type,
+            rng.randint(8, 90),
+            rng.randint(8, 90),
+            rng.randint(1, 12),
+            rng.randint(0, 120),
+        )
+        assert_matches_reference(rendered_mask(*case), case)
+
+
+def test_nine_slice_matches_sd_box():
+    rng = random.Random(2)
+    for _ in range(1000):
+        w = rng.randint(1, 160)
+        h = rng.randint(1, 160)
+        border_size = rng.randint(1, 40)
+        corner_radius = rng.randint(0, 200)
+        case = (cpu_render.SHAPE_TYPE_RECTANGLE, w, h, border_size, corner_radius)
+        np.testing.assert_array_equal(
+            rendered_mask(*case), sdf_mask(*case), err_msg=str(case)
+        )
+
+
+def test_render_color_and_background():
+    pixels = cpu_render.render_border_pixels(
+        20, 10, cpu_render.SHAPE_TYPE_RECTANGLE, 2, (0.0, 0.5, 1.0, 0.5), 0
+    ).reshape(10, 20, 4)
+    mask = pixels[:, :, 3] > 0
+    assert (pixels[mask] == (0, 128, 255, 128)).all()
+    assert (pixels[~mask] == 0).all()
+
+
+@pytest.mark.parametrize("shape_type", ["rectangle", "Ellipse"])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_iter_border_tiles_reassembles_image(shape_type, reverse):
+    w, h = 57, 45
+    expected = cpu_render.render_border_pixels(w, h, shape_type, 4, COLOR, 20)
+    pixels = np.zeros((h, w, 4), dtype=np.uint8)
+    starts = []
+    for y0, tile in cpu_render.iter_border_tiles(
+        w, h, shape_type, 4, COLOR, 20, tile_rows=8, reverse=reverse
+    ):
+        pixels[y0 : y0 + tile.shape[0]] = tile
+        starts.append(y0)
+    assert starts == sorted(starts, reverse=reverse)
+    np.testing.assert_array_equal(pixels.reshape(-1), expected)
@@ -0,0 +1,84 @@
+import pytest
+
+from borderman import geometry
+
+SCREEN = geometry.Rect(0, 0, 1920, 1080)
+BORDER_SIZE = 10
+
+
+def visible_box(image_w, image_h, offset, scale, origin):
+    # Blenderと同じく、画像の中心をスクリーンの中央+offsetに置き、originを基準に拡大する
+    #   (左, 上, 右, 下)。yは上向き
+    center_x = SCREEN.w / 2 + offset[0]
+    center_y = -SCREEN.h / 2 + offset[1]
+    pivot_x = center_x + (origin[0] - 0.5) * image_w
+    pivot_y = center_y + (origin[1] - 0.5) * image_h
+    return (
+        pivot_x + (center_x - image_w / 2 - pivot_x) * scale[0],
+        pivot_y + (center_y + image_h / 2 - pivot_y) * scale[1],
+        pivot_x + (center_x + image_w / 2 - pivot_x) * scale[0],
+        pivot_y + (center_y - image_h / 2 - pivot_y) * scale[1],
+    )
+
+
+def border_box(rect):
+    # 更新後の枠線ストリップ(スケール1)の表示範囲
+    offset = geometry.get_border_offset(rect, SCREEN)
+    full_w = rect.w + BORDER_SIZE * 2
+    full_h = rect.h + BORDER_SIZE * 2
+    return visible_box(full_w, full_h, offset, (1.0, 1.0), (0.5, 0.5))
+
+
+def update(rect, offset, scale, origin, proxy_scale=(1.0, 1.0)):
+    return geometry.get_transformed_border_rect(
+        rect, BORDER_SIZE, SCREEN, offset, scale, origin, proxy_scale
+    )
+
+
+def test_unchanged_border_keeps_rect():
+    rect = geometry.Rect(101, -57, 333, 201)
+    offset = geometry.get_border_offset(rect, SCREEN)
+    assert update(rect, offset, (1.0, 1.0), (0.0, 1.0)) is rect
+
+
+@pytest.mark.parametrize("scale", [(1.5, 1.5), (0.5, 2.0), (1.25, 0.8)])
+def test_scaled_around_top_left_keeps_top_left(scale):
+    # 枠線ストリップは左上(0, 1)を基準に作成される
+    rect = geometry.Rect(101, -57, 333, 201)
+    offset = geometry.get_border_offset(rect, SCREEN)
+    full_w = rect.w + BORDER_SIZE * 2
+    full_h = rect.h + BORDER_SIZE * 2
+    before = visible_box(full_w, full_h, offset, scale, (0.0, 1.0))
+
+    after = border_box(update(rect, offset, scale, (0.0, 1.0)))
+    assert after == pytest.approx(before, abs=1.0)
+    assert after[:2] == pytest.approx(before[:2], abs=0.5)
+
+
+@pytest.mark.parametrize("origin", [(0.5, 0.5), (1.0, 0.0), (0.25, 0.75)])
+def test_scaled_and_moved_around_any_origin(origin):
+    rect = geometry.Rect(400, -300, 250, 120)
+    offset = (37, -12)
+    full_w = rect.w + BORDER_SIZE * 2
+    full_h = rect.h + BORDER_SIZE * 2
+    before = visible_box(full_w, full_h, offset, (1.4, 0.6), origin)
+
+    after = border_box(update(rect, offset, (1.4, 0.6), origin))
+    assert after == pytest.approx(before, abs=1.0)
+
+
+def test_scaled_proxy_border():
+    # プロキシ画像(1/4)は中心を基準に4倍で表示され、ユーザーがさらに1.5倍にした
+    rect = geometry.Rect(400, -300, 250, 120)
+    offset = geometry.get_border_offset(rect, SCREEN)
+    full_w = rect.w + BORDER_SIZE * 2
+    full_h = rect.h + BORDER_SIZE * 2
+    proxy_scale = (4.0, 4.0)
+    before = visible_box(full_w / 4, full_h / 4, offset, (6.0, 6.0), (0.5, 0.5))
+
+    new_rect = update(rect, offset, (6.0, 6.0), (0.5, 0.5), proxy_scale)
+    assert (new_rect.w, new_rect.h) == (
+        round(full_w * 1.5) - 20,
+        round(full_h * 1.5) - 20,
+    )
+    assert border_box(new_rect) == pytest.approx(before, abs=1.0)
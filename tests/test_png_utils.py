@@ -0,0 +1,165 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from borderman import png_utils
+
+
+def read_png(path):
+    """Decodes the PNGs written by png_utils into (h, w, 4) RGBA from the top row."""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == png_utils.PNG_SIGNATURE
+    pos = 8
+    chunks = []
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        chunk_type = data[pos + 4 : pos + 8]
+        body = data[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(body, zlib.crc32(chunk_type))
+        chunks.append((chunk_type, body))
+        pos += 12 + length
+    assert chunks[0][0] == b"IHDR" and chunks[-1][0] == b"IEND"
+    w, h, bit_depth, color_type, _, _, _ = struct.unpack(">IIBBBBB", chunks[0][1])
+    raw = zlib.decompress(b"".join(body for t, body in chunks if t == b"IDAT"))
+
+    if color_type == png_utils.COLOR_TYPE_RGBA:
+        stride = w * 4
+    else:
+        stride = -(-w * bit_depth // 8)
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(h, stride + 1)
+    # png_utilsはフィルターを使わない
+    assert (rows[:, 0] == 0).all()
+    rows = rows[:, 1:]
+    if color_type == png_utils.COLOR_TYPE_RGBA:
+        return rows.reshape(h, w, 4), color_type, bit_depth
+
+    chunk_map = dict(chunks)
+    palette = np.frombuffer(chunk_map[b"PLTE"], dtype=np.uint8).reshape(-1, 3)
+    alpha = np.frombuffer(chunk_map[b"tRNS"], dtype=np.uint8)
+    bits = np.unpackbits(rows, axis=1)[:, : w * bit_depth].reshape(h, w, bit_depth)
+    weights = 1 << np.arange(bit_depth - 1, -1, -1)
+    indices = (bits * weights).sum(axis=2)
+    rgba = np.concatenate([palette[indices], alpha[indices][:, :, None]], axis=2)
+    return rgba.astype(np.uint8), color_type, bit_depth
+
+
+def make_pixels(w, h, colors, seed=0):
+    # 指定した色をランダムに並べたRGBA(行は下から並ぶ)
+    rng = np.random.default_rng(seed)
+    colors = np.array(colors, dtype=np.uint8)
+    return colors[rng.integers(0, len(colors), size=(h, w))]
+
+
+TWO_COLORS = [(0, 0, 0, 0), (255, 0, 0, 255)]
+
+
+@pytest.mark.parametrize("bottom_up", [True, False])
+def test_write_png_round_trip(tmp_path, bottom_up):
+    pixels = make_pixels(13, 7, [(1, 2, 3, 4), (200, 100, 50, 255), (0, 0, 0, 0)])
+    path = tmp_path / "rgba.png"
+    png_utils.write_png(str(path), pixels.tobytes(), 13, 7, bottom_up=bottom_up)
+    rgba, color_type, _ = read_png(path)
+    assert color_type == png_utils.COLOR_TYPE_RGBA
+    expected = pixels[::-1] if bottom_up else pixels
+    np.testing.assert_array_equal(rgba, expected)
+
+
+def test_write_png_checks_buffer_size(tmp_path):
+    with pytest.raises(ValueError):
+        png_utils.write_png(str(tmp_path / "bad.png"), bytes(10), 4, 4)
+
+
+def test_write_png_splits_idat_chunks(tmp_path):
+    # 圧縮できないデータで、IDATチャンクが複数に分かれる場合
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, size=(256, 512, 4), dtype=np.uint8)
+    path = tmp_path / "noise.png"
+    png_utils.write_png(str(path), pixels.tobytes(), 512, 256, compress_level=0)
+    assert path.read_bytes().count(b"IDAT") > 1
+    rgba, _, _ = read_png(path)
+    np.testing.assert_array_equal(rgba, pixels[::-1])
+
+
+@pytest.mark.parametrize(
+    "color_count, bit_depth", [(2, 1), (3, 2), (4, 2), (5, 4), (16, 4)]
+)
+def test_write_indexed_png_round_trip(tmp_path, color_count, bit_depth):
+    colors = [(i * 10, 255 - i, i, i * 16) for i in range(color_count)]
+    pixels = make_pixels(21, 9, colors)
+    # 全ての色を含める
+    pixels[0, :color_count] = colors
+    path = tmp_path / "indexed.png"
+    png_utils.write_indexed_png(str(path), pixels.tobytes(), 21, 9)
+    rgba, color_type, actual_bit_depth = read_png(path)
+    assert color_type == png_utils.COLOR_TYPE_PALETTE
+    assert actual_bit_depth == bit_depth
+    np.testing.assert_array_equal(rgba, pixels[::-1])
+
+
+def test_write_indexed_png_falls_back_to_rgba(tmp_path):
+    colors = [(i, i, i, 255) for i in range(png_utils.MAX_PALETTE_COLORS + 1)]
+    # パレットの上限を1色超える(全ての色を含める)
+    pixels = make_pixels(8, 8, colors)
+    pixels.reshape(-1, 4)[: len(colors)] = colors
+    path = tmp_path / "fallback.png"
+    png_utils.write_indexed_png(str(path), pixels.tobytes(), 8, 8)
+    rgba, color_type, _ = read_png(path)
+    assert color_type == png_utils.COLOR_TYPE_RGBA
+    np.testing.assert_array_equal(rgba, pixels[::-1])
+
+
+@pytest.mark.parametrize("mode", [png_utils.PNG_MODE_RGBA, png_utils.PNG_MODE_INDEXED])
+def test_write_png_mode_round_trip(tmp_path, mode):
+    pixels = make_pixels(30, 11, TWO_COLORS)
+    path = tmp_path / "mode.png"
+    png_utils.write_png_mode(str(path), pixels.tobytes(), 30, 11, mode=mode)
+    rgba, _, _ = read_png(path)
+    np.testing.assert_array_equal(rgba, pixels[::-1])
+
+
+@pytest.mark.parametrize("mode", [png_utils.PNG_MODE_RGBA, png_utils.PNG_MODE_INDEXED])
+def test_write_png_rows_round_trip(tmp_path, mode):
+    # 行を上から順に渡す
+    pixels = make_pixels(17, 10, TWO_COLORS)
+    path = tmp_path / "rows.png"
+    png_utils.write_png_rows(
+        str(path), iter(pixels), 17, 10, mode=mode, palette=np.array(TWO_COLORS)
+    )
+    rgba, color_type, _ = read_png(path)
+    expected_type = (
+        png_utils.COLOR_TYPE_PALETTE
+        if mode == png_utils.PNG_MODE_INDEXED
+        else png_utils.COLOR_TYPE_RGBA
+    )
+    assert color_type == expected_type
+    np.testing.assert_array_equal(rgba, pixels)
+
+
+def test_write_png_rows_checks_row_count(tmp_path):
+    pixels = make_pixels(4, 3, TWO_COLORS)
+    path = tmp_path / "short.png"
+    with pytest.raises(ValueError):
+        png_utils.write_png_rows(str(path), iter(pixels[:2]), 4, 3)
+    # 書き込みに失敗した場合は、出力パスにファイルを残さない
+    assert not path.exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_png_rows_rejects_colors_not_in_palette(tmp_path):
+    pixels = make_pixels(6, 4, TWO_COLORS)
+    pixels[2, 3] = (0, 255, 0, 255)
+    path = tmp_path / "unknown.png"
+    with pytest.raises(ValueError):
+        png_utils.write_png_rows(
+            str(path),
+            iter(pixels),
+            6,
+            4,
+            mode=png_utils.PNG_MODE_INDEXED,
+            palette=np.array(TWO_COLORS),
+        )
+    assert list(tmp_path.iterdir()) == []
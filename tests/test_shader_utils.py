@@ -0,0 +1,208 @@
+import contextlib
+import itertools
+import random
+import types
+
+import numpy as np
+import pytest
+
+from borderman import cpu_render, geometry, shader_utils
+
+
+def _overlaps(a, b):
+    return a.x < b.x + b.w and b.x < a.x + a.w and a.y < b.y + b.h and b.y < a.y + a.h
+
+
+def test_pack_atlas_page_height_excludes_shelf_padding():
+    pages, oversized = shader_utils.pack_atlas([(40, 64), (40, 64)], 64)
+    assert oversized == []
+    assert [(page.w, page.h) for page in pages] == [(40, 64), (40, 64)]
+
+
+def test_pack_atlas_full_size_pages_fit_max_texture_size():
+    pages, oversized = shader_utils.pack_atlas([(4096, 2048), (4096, 2048)], 4096)
+    assert oversized == []
+    # 段の間の余白のため2ページに分かれ、どちらも最大サイズを超えない
+    assert [(page.w, page.h) for page in pages] == [(4096, 2048), (4096, 2048)]
+
+
+def test_pack_atlas_oversized():
+    pages, oversized = shader_utils.pack_atlas([(10, 10), (65, 10), (10, 65)], 64)
+    assert sorted(oversized) == [1, 2]
+    assert [len(page.placements) for page in pages] == [1]
+
+
+def test_pack_atlas_random_layouts():
+    rng = random.Random(0)
+    for _ in range(200):
+        atlas_size = rng.choice([64, 128, 256])
+        sizes = [
+            (rng.randint(1, atlas_size), rng.randint(1, atlas_size))
+            for _ in range(rng.randint(1, 30))
+        ]
+        pages, oversized = shader_utils.pack_atlas(sizes, atlas_size)
+        assert oversized == []
+        placed = sorted(p.index for page in pages for p in page.placements)
+        assert placed == list(range(len(sizes)))
+        for page in pages:
+            assert page.w <= atlas_size and page.h <= atlas_size
+            for p in page.placements:
+                assert (p.w, p.h) == sizes[p.index]
+                assert p.x + p.w <= page.w and p.y + p.h <= page.h
+            for a, b in itertools.combinations(page.placements, 2):
+                assert not _overlaps(a, b)
+
+
+class RecordingShader:
+    # GPUを使わずに、設定されたユニフォームを記録する
+    def __init__(self):
+        self.uniforms = {}
+
+    def bind(self):
+        pass
+
+    def uniform_float(self, name, value):
+        self.uniforms[name] = value
+
+
+class RecordingBatch:
+    def __init__(self):
+        self.draws = []
+
+    def draw(self, shader):
+        self.draws.append(dict(shader.uniforms))
+
+
+@pytest.fixture
+def draw_border(monkeypatch):
+    # shader_utilsの描画関数を呼び出し、描画時のユニフォームを返す
+    shader = RecordingShader()
+    batch = RecordingBatch()
+    monkeypatch.setattr(shader_utils, "get_border_shader", lambda key: shader)
+    monkeypatch.setattr(shader_utils, "get_border_batch", lambda key: batch)
+    monkeypatch.setattr(
+        shader_utils,
+        "gpu",
+        types.SimpleNamespace(
+            matrix=types.SimpleNamespace(push_pop=contextlib.nullcontext)
+        ),
+    )
+
+    def draw(shape_type, w, h, border_size, corner_radius, tile=None):
+        shader.uniforms.clear()
+        border_rect = geometry.Rect(0, 0, w, h)
+        if shape_type == shader_utils.SHAPE_TYPE_RECTANGLE:
+            shader_utils.draw_rounded_rectagle_border(
+                border_rect, COLOR, border_size, corner_radius, tile=tile
+            )
+        else:
+            shader_utils.draw_ellipse_border(border_rect, COLOR, border_size, tile=tile)
+        return batch.draws[-1]
+
+    return draw
+
+
+COLOR = (1.0, 0.0, 0.0, 1.0)
+
+
+def _sdf(shape_type, px, py, box_size, corner_radius):
+    if shape_type == shader_utils.SHAPE_TYPE_RECTANGLE:
+        return cpu_render.sd_box(px, py, box_size[0], box_size[1], corner_radius)
+    return cpu_render.sd_ellipse(px, py, box_size[0], box_size[1])
+
+
+def _viewport_pos(w, h):
+    # フルスクリーンの四角形を描画した時の、各ピクセルの中心でのpos(-1から1)
+    xs = (np.arange(w) + 0.5) / w * 2 - 1
+    ys = (np.arange(h) + 0.5) / h * 2 - 1
+    return np.meshgrid(xs, ys)
+
+
+def _fragment_distances(shape_type, uniforms, viewport_w, viewport_h):
+    # フラグメントシェーダーのmain()と同じ式で、ビューポートの各ピクセルのSDFを求める
+    pos_x, pos_y = _viewport_pos(viewport_w, viewport_h)
+    half_w, half_h = uniforms["tileHalfSize"]
+    center_x, center_y = uniforms["tileCenter"]
+    return _sdf(
+        shape_type,
+        pos_x * half_w + center_x,
+        pos_y * half_h + center_y,
+        uniforms["boxSize"],
+        uniforms.get("cornerRadius", 0.0),
+    )
+
+
+def _border_distances(draw_border, shape_type, w, h, border_size, corner_radius):
+    uniforms = draw_border(shape_type, w, h, border_size, corner_radius)
+    d = _fragment_distances(shape_type, uniforms, w, h)
+    return d, uniforms["borderSize"]
+
+
+def _legacy_border_distances(shape_type, w, h, border_size, corner_radius):
+    # 以前の描画: 正方形のオフスクリーン全体に正規化座標で描画し、枠線の領域を読み出す
+    screen_size = max(w, h)
+    if abs(w - h) % 2 != 0:
+        screen_size += 1
+    offset_x = round((screen_size - w) / 2)
+    offset_y = round((screen_size - h) / 2)
+    pos_x, pos_y = _viewport_pos(screen_size, screen_size)
+    region = np.s_[offset_y : offset_y + h, offset_x : offset_x + w]
+    d = _sdf(
+        shape_type,
+        pos_x[region],
+        pos_y[region],
+        (w / screen_size, h / screen_size),
+        corner_radius / screen_size,
+    )
+    # ピクセル単位に換算する
+    return d * (screen_size / 2), border_size
+
+
+def _mask(d, border_size):
+    return (-border_size <= d) & (d <= 0)
+
+
+@pytest.mark.parametrize("shape_type", ["rectangle", "Ellipse"])
+@pytest.mark.parametrize("corner_radius", [0, 80])
+@pytest.mark.parametrize("size", [(440, 340), (1940, 160), (1281, 721), (400, 400)])
+def test_exact_offscreen_matches_legacy_square_offscreen(
+    draw_border, shape_type, corner_radius, size
+):
+    # 正方形のオフスクリーンとの差が偶数のサイズでは、以前と同じ描画結果になる
+    w, h = size
+    d, border_size = _border_distances(draw_border, shape_type, w, h, 12, corner_radius)
+    legacy, _ = _legacy_border_distances(shape_type, w, h, 12, corner_radius)
+    assert border_size == 12
+    # 楕円のニュートン法は縮尺によって収束がわずかに異なる
+    np.testing.assert_allclose(d, legacy, atol=1e-3)
+    np.testing.assert_array_equal(_mask(d, border_size), _mask(legacy, 12))
+
+
+@pytest.mark.parametrize("shape_type", ["rectangle", "Ellipse"])
+@pytest.mark.parametrize("size", [(441, 340), (160, 1941)])
+def test_exact_offscreen_centers_odd_sizes(draw_border, shape_type, size):
+    # 長辺が奇数のサイズでは、以前は半ピクセルずれていたが、現在は中心に描画する
+    w, h = size
+    d, border_size = _border_distances(draw_border, shape_type, w, h, 12, 80)
+    mask = _mask(d, border_size)
+    legacy = _mask(_legacy_border_distances(shape_type, w, h, 12, 80)[0], 12)
+    assert (mask != legacy).any()
+    np.testing.assert_array_equal(mask, mask[::-1, ::-1])
+    assert not (legacy == legacy[::-1, ::-1]).all()
+
+
+@pytest.mark.parametrize("shape_type", ["rectangle", "Ellipse"])
+def test_tiled_draw_matches_full_draw(draw_border, shape_type):
+    # タイルごとに描画した結果をつなげると、全体を1回で描画した結果と一致する
+    w, h = 301, 157
+    full, border_size = _border_distances(draw_border, shape_type, w, h, 9, 60)
+    tiled = np.full((h, w), np.nan)
+    for y0, y1 in [(0, 64), (64, 128), (128, h)]:
+        for x0, x1 in [(0, 100), (100, 250), (250, w)]:
+            tile = (x0, y0, x1 - x0, y1 - y0)
+            uniforms = draw_border(shape_type, w, h, 9, 60, tile=tile)
+            tiled[y0:y1, x0:x1] = _fragment_distances(
+                shape_type, uniforms, x1 - x0, y1 - y0
+            )
+    np.testing.assert_allclose(tiled, full, atol=1e-9)
+    np.testing.assert_array_equal(_mask(tiled, border_size), _mask(full, border_size))
@@ -1,46 +1,110 @@
 import bpy
-import datetime
+from bpy_extras import anim_utils
+import concurrent.futures
+import contextlib
 from dataclasses import dataclass
+import hashlib
 import os
-import secrets
 
 from mathutils import Matrix
 import gpu
+import numpy as np
+from .channels import ChannelAllocator
+from . import cpu_render
+from .geometry import Rect, get_border_offset
+from . import png_utils
 from . import shader_utils
+from . import stats
 
 
-@dataclass(frozen=True)
-class Rect:
-    x: int
-    y: int
-    w: int
-    h: int
+# ストリップのオフセットやスケール、画像の表示サイズは100%の解像度が基準になる
+#   解像度の割合(%)を下げたレンダリングでは、シーケンサーが全体を縮小する
+FULL_RESOLUTION_PERCENTAGE = 100
 
 
-def get_screen_rect() -> Rect:
+def get_screen_rect(percentage=None) -> Rect:
+    # percentageを省略した場合は、レンダリング設定の解像度の割合を使う
     render = bpy.context.scene.render
-    width = render.resolution_x * (render.resolution_percentage / 100)
-    height = render.resolution_y * (render.resolution_percentage / 100)
+    if percentage is None:
+        percentage = render.resolution_percentage
+    width = render.resolution_x * (percentage / 100)
+    height = render.resolution_y * (percentage / 100)
     return Rect(0, 0, round(width), round(height))
 
 
 def get_placeholder_info(placeholder_strip: bpy.types.ColorStrip) -> Rect:
     # スクリーン解像度
-    screen_rect = get_screen_rect()
+    screen_rect = get_screen_rect(FULL_RESOLUTION_PERCENTAGE)
     trans = placeholder_strip.transform
+    return _get_placeholder_rect(
+        screen_rect, trans.offset_x, trans.offset_y, trans.scale_x, trans.scale_y
+    )
+
+
+def _get_placeholder_rect(screen_rect, offset_x, offset_y, scale_x, scale_y) -> Rect:
     # ストリップのサイズ
-    strip_w = screen_rect.w * trans.scale_x
-    strip_h = screen_rect.h * trans.scale_y
+    strip_w = screen_rect.w * scale_x
+    strip_h = screen_rect.h * scale_y
     # ストリップの位置
     xy = [
-        trans.offset_x,
-        trans.offset_y,
+        offset_x,
+        offset_y,
     ]
     return Rect(*[round(p) for p in (xy[0], xy[1], strip_w, strip_h)])
 
 
+# 枠線の位置とサイズを決めるtransformのプロパティ
+TRANSFORM_PROPS = ("offset_x", "offset_y", "scale_x", "scale_y")
+
+
+def _get_scene_channelbag(scene: bpy.types.Scene):
+    anim = scene.animation_data
+    if anim is None or anim.action is None:
+        return None
+    return anim_utils.action_get_channelbag_for_slot(anim.action, anim.action_slot)
+
+
+def get_transform_fcurves(strip: bpy.types.Strip):
+    # ストリップのtransformのうち、キーフレームが設定されたプロパティのF-Curve
+    channelbag = _get_scene_channelbag(strip.id_data)
+    if channelbag is None:
+        return {}
+    paths = {strip.transform.path_from_id(prop): prop for prop in TRANSFORM_PROPS}
+    return {
+        paths[fcurve.data_path]: fcurve
+        for fcurve in channelbag.fcurves
+        if fcurve.data_path in paths
+    }
+
+
+def remove_transform_fcurves(strip: bpy.types.Strip):
+    # 削除したストリップと同名のストリップが、アニメーションを引き継がないようにする
+    channelbag = _get_scene_channelbag(strip.id_data)
+    for fcurve in get_transform_fcurves(strip).values():
+        channelbag.fcurves.remove(fcurve)
+
+
+def get_placeholder_frame_rects(placeholder_strip: bpy.types.ColorStrip):
+    # フレームごとの位置とサイズ。キーフレームが無い場合はNone
+    fcurves = get_transform_fcurves(placeholder_strip)
+    if not fcurves:
+        return None
+    screen_rect = get_screen_rect(FULL_RESOLUTION_PERCENTAGE)
+    trans = placeholder_strip.transform
+    rects = []
+    for frame in range(
+        placeholder_strip.frame_final_start, placeholder_strip.frame_final_end
+    ):
+        values = [
+            fcurves[prop].evaluate(frame) if prop in fcurves else getattr(trans, prop)
+            for prop in TRANSFORM_PROPS
+        ]
+        rects.append(_get_placeholder_rect(screen_rect, *values))
+    return rects
+
+
 def move_center(strip: bpy.types.ColorStrip):
-    screen_rect = get_screen_rect()
+    screen_rect = get_screen_rect(FULL_RESOLUTION_PERCENTAGE)
     strip_origin = strip.transform.origin
     strip_w = screen_rect.w * strip.transform.scale_x
     strip_h = screen_rect.h * strip.transform.scale_y
@@ -56,29 +120,12 @@ def move_center(strip: bpy.types.ColorStrip):
     )
 
 
-def guess_available_channel(frame_start, frame_end, target_channel, seqs):
-    unavailable_channels = set()
-    for seq in seqs:
-        if seq.channel in unavailable_channels:
-            continue
-        elif (
-            frame_start <= seq.frame_final_start < frame_end
-            or frame_start <= seq.frame_final_end <= frame_end
-        ):
-            unavailable_channels.add(seq.channel)
-        elif (
-            seq.frame_final_start <= frame_start <= seq.frame_final_end
-            and seq.frame_final_start <= frame_end <= seq.frame_final_end
-        ):
-            unavailable_channels.add(seq.channel)
-    if target_channel not in unavailable_channels:
-        return target_channel
-
-    last_no = sorted(unavailable_channels)[-1]
-    candidate = set(range(target_channel, last_no + 2))
-    diff = sorted(candidate - unavailable_channels)
-    # 使われていない最小のチャンネルを返す
-    return diff[0]
+def guess_available_channel(
+    frame_start, frame_end, target_channel, allocator: ChannelAllocator
+):
+    channel = allocator.find_free_channel(frame_start, frame_end, target_channel)
+    # 空きが無い場合は、重なりの解消をBlenderに任せる
+    return channel if channel is not None else target_channel
 
 
 def showMessageBox(messages=[""], title="Message Box", icon="INFO"):
@@ -107,7 +154,192 @@ def normalize_image_dir(image_dir):
             return None
 
 
-def create_border_strip(
+def normalize_path(path, library=None):
+    # 参照の比較用に、絶対パスへ展開して表記を揃える
+    abs_path = bpy.path.abspath(path, library=library)
+    return os.path.normcase(os.path.normpath(abs_path))
+
+
+# 枠線ストリップが持つ、プロキシ画像とフル解像度の画像のパス(カスタムプロパティ)
+CUSTOM_KEY_PROXY_IMAGE = "border_proxy_image"
+CUSTOM_KEY_FULL_IMAGE = "border_full_image"
+VARIANT_IMAGE_KEYS = (CUSTOM_KEY_PROXY_IMAGE, CUSTOM_KEY_FULL_IMAGE)
+
+
+def collect_referenced_image_paths():
+    used_paths = set()
+    for scene in bpy.data.scenes:
+        se = scene.sequence_editor
+        if not se:
+            continue
+        # strips_allはメタストリップ内のストリップも含む
+        for strip in se.strips_all:
+            if strip.type != "IMAGE":
+                continue
+            for elm in strip.elements:
+                img_path = os.path.join(strip.directory, elm.filename)
+                used_paths.add(normalize_path(img_path, library=scene.library))
+            # 表示中ではないプロキシ/フル解像度の画像も使用中として扱う
+            for key in VARIANT_IMAGE_KEYS:
+                if key in strip:
+                    used_paths.add(normalize_path(strip[key], library=scene.library))
+    for img in bpy.data.images:
+        if img.filepath:
+            used_paths.add(normalize_path(img.filepath, library=img.library))
+    return used_paths
+
+
+def iter_unused_images(image_dir, used_paths):
+    with os.scandir(image_dir) as it:
+        for entry in it:
+            if not entry.name.lower().endswith(".png"):
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if normalize_path(entry.path) not in used_paths:
+                yield entry
+
+
+def sweep_unused_images(image_dir, dry_run=False):
+    # 全シーン(メタストリップ内を含む)と画像データから参照されていない画像を削除する
+    used_paths = collect_referenced_image_paths()
+    count = 0
+    reclaimed_bytes = 0
+    for entry in iter_unused_images(image_dir, used_paths):
+        count += 1
+        reclaimed_bytes += entry.stat().st_size
+        if dry_run:
+            print("unused image...", entry.path)
+        else:
+            print("remove unused image...", entry.path)
+            os.remove(entry.path)
+    return count, reclaimed_bytes
+
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+
+BORDER_IMAGE_PREFIX = "border_"
+
+
+def _border_style_key(shape_type, border_size, border_color, corner_radius):
+    # 描画結果に影響する値のみを使う
+    #   色はUBYTEで書き出すため、8bitに丸めた値を使う
+    is_rectangle = shape_type == shader_utils.SHAPE_TYPE_RECTANGLE
+    return (
+        shader_utils.SHAPE_TYPE_RECTANGLE if is_rectangle else "ellipse",
+        int(border_size),
+        tuple(round(c * 255) for c in border_color),
+        int(corner_radius) if is_rectangle else 0,
+    )
+
+
+def get_border_image_name(
+    border_rect, shape_type, border_size, border_color, corner_radius
+):
+    key = (border_rect.w, border_rect.h) + _border_style_key(
+        shape_type, border_size, border_color, corner_radius
+    )
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+    return f"{BORDER_IMAGE_PREFIX}{digest}.png"
+
+
+def get_border_fingerprint(
+    strip_rect, shape_type, border_size, border_color, corner_radius
+):
+    # 位置を含む枠線ストリップの状態。変更の検出に使う
+    rect_key = (strip_rect.x, strip_rect.y, strip_rect.w, strip_rect.h)
+    key = rect_key + _border_style_key(
+        shape_type, border_size, border_color, corner_radius
+    )
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def scale_rect(rect, scale) -> Rect:
+    if scale == 1.0:
+        return rect
+    return Rect(
+        round(rect.x * scale),
+        round(rect.y * scale),
+        max(round(rect.w * scale), 1),
+        max(round(rect.h * scale), 1),
+    )
+
+
+def scale_border_style(border_size, corner_radius, scale):
+    # プロキシ用に縮小した枠線の太さと角の丸み
+    if scale == 1.0:
+        return border_size, corner_radius
+    return max(round(border_size * scale), 1), round(corner_radius * scale)
+
+
+@dataclass(frozen=True)
+class BorderImagePlan:
+    output_path: str
+    # 枠線ストリップを配置する領域(100%の解像度)
+    rect: Rect
+    # 描画する枠線画像の領域(プロキシの場合は縮小後)
+    border_rect: Rect
+    # 描画時の倍率。1未満の場合は編集用のプロキシ画像
+    scale: float = 1.0
+
+    @property
+    def render_rect(self):
+        return scale_rect(self.rect, self.scale)
+
+
+def plan_border_image(
+    src_strip: bpy.types.Strip,
+    image_dir,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    scale=1.0,
+) -> BorderImagePlan:
+    return get_border_image_plan(
+        get_placeholder_info(src_strip),
+        image_dir,
+        shape_type,
+        border_size,
+        border_color,
+        corner_radius,
+        scale,
+    )
+
+
+def get_border_image_plan(
+    rect, image_dir, shape_type, border_size, border_color, corner_radius, scale=1.0
+) -> BorderImagePlan:
+    border_size, corner_radius = scale_border_style(border_size, corner_radius, scale)
+    border_rect = get_border_rect(scale_rect(rect, scale), border_size)
+    image_name = get_border_image_name(
+        border_rect, shape_type, border_size, border_color, corner_radius
+    )
+    return BorderImagePlan(
+        os.path.join(image_dir, image_name), rect, border_rect, scale
+    )
+
+
+@dataclass(frozen=True)
+class BorderSequencePlan:
+    # 位置やサイズにキーフレームがあるplaceholderのフレームごとの枠線画像
+    #   同じサイズのフレームは同じ画像を共有するため、描画はサイズの種類数で済む
+    frames: tuple
+
+    @property
+    def images(self):
+        # 重複を除いた枠線画像(フレーム順)
+        return tuple({plan.output_path: plan for plan in self.frames}.values())
+
+
+def plan_border_sequence(
     src_strip: bpy.types.Strip,
     image_dir,
     shape_type,
@@ -115,16 +347,54 @@ def create_border_strip(
     border_color,
     corner_radius,
 ):
+    # キーフレームが無い場合はNone(plan_border_imageを使う)
+    rects = get_placeholder_frame_rects(src_strip)
+    if rects is None:
+        return None
+    output_paths = {}
+    frames = []
+    for rect in rects:
+        border_rect = get_border_rect(rect, border_size)
+        output_path = output_paths.get((border_rect.w, border_rect.h))
+        if output_path is None:
+            image_name = get_border_image_name(
+                border_rect, shape_type, border_size, border_color, corner_radius
+            )
+            output_path = os.path.join(image_dir, image_name)
+            output_paths[(border_rect.w, border_rect.h)] = output_path
+        frames.append(BorderImagePlan(output_path, rect, border_rect))
+    return BorderSequencePlan(tuple(frames))
+
+
+@dataclass(frozen=True)
+class PlaceholderSlot:
+    # 枠線ストリップを配置するplaceholderの情報(placeholderの削除後も使える)
+    name: str
+    placeholder_id: str
+    channel: int
+    frame_final_start: int
+    frame_final_end: int
+
+
+def get_placeholder_slot(src_strip: bpy.types.Strip) -> PlaceholderSlot:
+    placeholder_id = f"{src_strip.get('placeholder_id', '')}"
+    return PlaceholderSlot(
+        src_strip.name,
+        placeholder_id,
+        src_strip.channel,
+        src_strip.frame_final_start,
+        src_strip.frame_final_end,
+    )
+
+
+def add_border_image_strip(src_strip, output_path, channel=None):
+    # src_stripはplaceholderのストリップ、またはPlaceholderSlot
+    if isinstance(src_strip, bpy.types.Strip):
+        src_strip = get_placeholder_slot(src_strip)
     if src_strip.name:
         file_name = f"{src_strip.name}"
     else:
-        file_name = f"{src_strip.get('placeholder_id')}"
-
-    output_path = os.path.join(image_dir, bpy.path.clean_name(file_name) + ".png")
-    rect = get_placeholder_info(src_strip)
-    create_border_image(
-        output_path, rect, shape_type, border_size, border_color, corner_radius
-    )
+        file_name = src_strip.placeholder_id
 
     rel_image_path = (
         bpy.path.relpath(output_path) if len(bpy.data.filepath) > 0 else output_path
@@ -132,9 +402,9 @@ def create_border_strip(
     # print(f"rel_image_path: {rel_image_path}")
     se = bpy.context.scene.sequence_editor
     img_strip = se.strips.new_image(
-        bpy.path.basename(rel_image_path),
+        bpy.path.clean_name(file_name) + ".png",
         rel_image_path,
-        src_strip.channel + 1,
+        channel if channel is not None else src_strip.channel + 1,
         src_strip.frame_final_start,
     )
     img_strip.frame_final_end = src_strip.frame_final_end
@@ -144,44 +414,154 @@ def create_border_strip(
     return img_strip
 
 
-def _make_unique_name(prefix="___"):
-    return "{0}{1}_{2}".format(
-        prefix, secrets.token_urlsafe(6), datetime.datetime.now().timestamp()
+def add_border_sequence_strip(
+    src_strip: PlaceholderSlot, plan: BorderSequencePlan, screen_rect, channel=None
+):
+    images = plan.images
+    img_strip = add_border_image_strip(
+        src_strip, images[0].output_path, channel=channel
     )
+    if len(images) > 1:
+        # サイズが変わる場合は、フレームごとに画像を切り替える連番ストリップにする
+        #   画像はすべて同じディレクトリにあるため、ファイル名のみを追加する
+        for frame_plan in plan.frames[1:]:
+            img_strip.elements.append(os.path.basename(frame_plan.output_path))
+        img_strip.frame_final_end = src_strip.frame_final_end
+
+    # 移動はtransformのキーフレームで表す(値が変わるフレームのみ)
+    trans = img_strip.transform
+    last_offset = None
+    for frame, frame_plan in enumerate(plan.frames, src_strip.frame_final_start):
+        offset = get_border_offset(frame_plan.rect, screen_rect)
+        if offset == last_offset:
+            continue
+        trans.offset_x, trans.offset_y = offset
+        trans.keyframe_insert("offset_x", frame=frame)
+        trans.keyframe_insert("offset_y", frame=frame)
+        last_offset = offset
+    # 丸めた値の間を補間しない
+    for fcurve in get_transform_fcurves(img_strip).values():
+        for keyframe in fcurve.keyframe_points:
+            keyframe.interpolation = "CONSTANT"
+    return img_strip
 
 
-def create_border_image(
-    output_path, strip_rect, shape_type, border_size, border_color, corner_radius
-):
-    border_rect = Rect(
+def get_border_rect(strip_rect, border_size) -> Rect:
+    return Rect(
         0,
         0,
         int(strip_rect.w + (border_size * 2)),
         int(strip_rect.h + (border_size * 2)),
     )
 
-    image_name = _make_unique_name()
-    offscreen_rect = shader_utils.get_offscreen_info(border_rect)
 
-    offscreen = gpu.types.GPUOffScreen(offscreen_rect.w, offscreen_rect.h)
+# プールに保持するオフスクリーンの合計サイズの上限(バイト)
+DEFAULT_OFFSCREEN_POOL_MEMORY_LIMIT = 256 * 1024 * 1024
+
+
+class OffscreenPool:
+    """Reuses GPUOffScreen buffers across many border renders."""
+
+    def __init__(self, memory_limit=DEFAULT_OFFSCREEN_POOL_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        # 未使用のオフスクリーン(返却順)
+        self._idle = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
+
+    @staticmethod
+    def _memory_size(offscreen):
+        # カラーバッファ(RGBA8)と深度バッファの概算
+        return offscreen.width * offscreen.height * 8
+
+    def memory_usage(self):
+        return sum(self._memory_size(o) for o in self._idle)
 
-    with offscreen.bind():
-        fb = gpu.state.active_framebuffer_get()
-        fb.clear(color=(0.0, 0.0, 0.0, 0.0))
+    def acquire(self, w, h) -> gpu.types.GPUOffScreen:
+        # 要求サイズ以上で最小のオフスクリーンを再利用する
+        candidates = [o for o in self._idle if o.width >= w and o.height >= h]
+        if candidates:
+            offscreen = min(candidates, key=lambda o: o.width * o.height)
+            self._idle.remove(offscreen)
+            return offscreen
+        return gpu.types.GPUOffScreen(w, h)
 
-        with gpu.matrix.push_pop():
-            # reset matrices -> use normalized device coordinates [-1, 1]
-            gpu.matrix.load_matrix(Matrix.Identity(4))
-            gpu.matrix.load_projection_matrix(Matrix.Identity(4))
+    def release(self, offscreen: gpu.types.GPUOffScreen):
+        self._idle.append(offscreen)
+        # 上限を超えた場合は古いものから解放する
+        while self._idle and self.memory_usage() > self.memory_limit:
+            self._idle.pop(0).free()
 
-            print(f"shape_type: {shape_type}")
+    def free(self):
+        for offscreen in self._idle:
+            offscreen.free()
+        self._idle.clear()
+
+
+def ubyte_buffer_view(buffer) -> np.ndarray:
+    # gpu.types.Bufferをコピーせずに1次元のUBYTE配列として参照する
+    return np.asarray(buffer, dtype=np.uint8).reshape(-1)
+
+
+def _sync_gpu_for_stats(fb):
+    # Python APIにはGPUのタイマークエリが無いため、計測時のみ1ピクセルを読み出して
+    # 描画の完了を待ち、描画時間にGPUの処理時間を含める
+    if stats.get_stats().sync_gpu:
+        fb.read_color(0, 0, 1, 1, 4, 0, "UBYTE")
+
+
+@contextlib.contextmanager
+def _bind_offscreen(pool: OffscreenPool, w, h):
+    offscreen = pool.acquire(w, h)
+    try:
+        with offscreen.bind():
+            fb = gpu.state.active_framebuffer_get()
+            # 大きいオフスクリーンを再利用する場合に備え、描画範囲を左下の領域に限定
+            gpu.state.viewport_set(0, 0, w, h)
+            gpu.state.scissor_test_set(True)
+            gpu.state.scissor_set(0, 0, w, h)
+            fb.clear(color=(0.0, 0.0, 0.0, 0.0))
+
+            try:
+                with gpu.matrix.push_pop():
+                    # reset matrices -> use normalized device coordinates [-1, 1]
+                    gpu.matrix.load_matrix(Matrix.Identity(4))
+                    gpu.matrix.load_projection_matrix(Matrix.Identity(4))
+                    yield fb
+            finally:
+                gpu.state.scissor_test_set(False)
+    finally:
+        pool.release(offscreen)
+
+
+def render_border_pixels(
+    strip_rect,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    offscreen_pool: OffscreenPool = None,
+) -> np.ndarray:
+    border_rect = get_border_rect(strip_rect, border_size)
+
+    offscreen_rect = shader_utils.get_offscreen_info(border_rect)
+
+    pool = offscreen_pool if offscreen_pool else OffscreenPool()
+    with _bind_offscreen(pool, offscreen_rect.w, offscreen_rect.h) as fb:
+        with stats.stage(stats.STAGE_RENDER):
             if shape_type == "rectangle":
                 shader_utils.draw_rounded_rectagle_border(
                     border_rect, border_color, border_size, corner_radius
                 )
             else:
                 shader_utils.draw_ellipse_border(border_rect, border_color, border_size)
+            _sync_gpu_for_stats(fb)
 
+        with stats.stage(stats.STAGE_READBACK):
             buffer = fb.read_color(
                 offscreen_rect.offset_x,
                 offscreen_rect.offset_y,
@@ -191,20 +571,345 @@ def create_border_image(
                 0,
                 "UBYTE",
             )
+    stats.count(stats.COUNTER_BORDERS_RENDERED)
+    if not offscreen_pool:
+        pool.free()
+
+    buffer.dimensions = border_rect.w * border_rect.h * 4
+    return ubyte_buffer_view(buffer)
+
+
+RENDER_BACKEND_AUTO = "AUTO"
+RENDER_BACKEND_GPU = "GPU"
+RENDER_BACKEND_CPU = "CPU"
+
+_gpu_available = None
+
+
+def is_gpu_available():
+    # `blender --background`などGPUが使えない環境では、オフスクリーンの作成に失敗する
+    global _gpu_available
+    if _gpu_available is None:
+        try:
+            gpu.types.GPUOffScreen(1, 1).free()
+            _gpu_available = True
+        except Exception as e:
+            print(f"GPU is not available, fallback to CPU rendering: {e}")
+            _gpu_available = False
+    return _gpu_available
+
+
+def resolve_render_backend(backend, shape_type=None):
+    if backend == RENDER_BACKEND_AUTO:
+        # 角丸の矩形はCPUでも角のタイルと辺の塗りつぶしのみで組み立てられるため、
+        # GPUからの読み出しより速い
+        if shape_type == shader_utils.SHAPE_TYPE_RECTANGLE:
+            return RENDER_BACKEND_CPU
+        return RENDER_BACKEND_GPU if is_gpu_available() else RENDER_BACKEND_CPU
+    return backend
+
+
+def render_border_pixels_cpu(
+    strip_rect, shape_type, border_size, border_color, corner_radius
+) -> np.ndarray:
+    border_rect = get_border_rect(strip_rect, border_size)
+    with stats.stage(stats.STAGE_RENDER):
+        pixels = cpu_render.render_border_pixels(
+            border_rect.w,
+            border_rect.h,
+            shape_type,
+            border_size,
+            border_color,
+            corner_radius,
+        )
+    stats.count(stats.COUNTER_BORDERS_RENDERED)
+    return pixels
 
-    offscreen.free()
-    if image_name in bpy.data.images:
-        img = bpy.data.images[image_name]
-        bpy.data.images.remove(img)
 
-    img = bpy.data.images.new(
-        image_name, width=border_rect.w, height=border_rect.h, alpha=True
+@dataclass(frozen=True)
+class BorderRenderRequest:
+    strip_rect: Rect
+    shape_type: str
+    border_size: int
+    border_color: tuple
+    corner_radius: int
+
+
+def render_border_pixels_batch(
+    requests, offscreen_pool: OffscreenPool = None
+) -> list:
+    # 複数の枠線を1枚のアトラスにまとめて描画し、1回の読み出しで取得する
+    border_rects = [get_border_rect(r.strip_rect, r.border_size) for r in requests]
+    pages, oversized = shader_utils.pack_atlas(
+        [(r.w, r.h) for r in border_rects], shader_utils.get_max_atlas_size()
     )
-    img.file_format = "PNG"
-    img.alpha_mode = "STRAIGHT"
-    img.filepath = output_path
-    buffer.dimensions = border_rect.w * border_rect.h * 4
-    img.pixels = [v / 255 for v in buffer]
-    img.save()
-    bpy.data.images.remove(img)
-    print(f"create_border_image: {output_path}")
+    styles = {
+        i: (r.shape_type, r.border_color, r.border_size, r.corner_radius)
+        for i, r in enumerate(requests)
+    }
+
+    results = [None] * len(requests)
+    pool = offscreen_pool if offscreen_pool else OffscreenPool()
+    for page in pages:
+        with _bind_offscreen(pool, page.w, page.h) as fb:
+            with stats.stage(stats.STAGE_RENDER):
+                shader_utils.draw_border_atlas(page, styles)
+                _sync_gpu_for_stats(fb)
+            with stats.stage(stats.STAGE_READBACK):
+                buffer = fb.read_color(0, 0, page.w, page.h, 4, 0, "UBYTE")
+        stats.count(stats.COUNTER_BORDERS_RENDERED, len(page.placements))
+        buffer.dimensions = page.w * page.h * 4
+        atlas = ubyte_buffer_view(buffer).reshape(page.h, page.w, 4)
+        for p in page.placements:
+            pixels = atlas[p.y : p.y + p.h, p.x : p.x + p.w]
+            results[p.index] = np.ascontiguousarray(pixels).reshape(-1)
+    # アトラスに収まらない枠線は個別に描画する
+    for i in oversized:
+        r = requests[i]
+        results[i] = render_border_pixels(
+            r.strip_rect,
+            r.shape_type,
+            r.border_size,
+            r.border_color,
+            r.corner_radius,
+            offscreen_pool=pool,
+        )
+    if not offscreen_pool:
+        pool.free()
+    return results
+
+
+# 全体を1回で描画せず、タイルに分けて描画する枠線画像のピクセル数
+#   (8Kの全画面の枠線など。RGBAで64MB)
+TILED_RENDER_MIN_PIXELS = 4096 * 4096
+# タイルの1辺のピクセル数
+TILE_SIZE = 1024
+
+
+def needs_tiled_render(border_rect, render_backend):
+    if border_rect.w * border_rect.h >= TILED_RENDER_MIN_PIXELS:
+        return True
+    if render_backend == RENDER_BACKEND_CPU:
+        return False
+    # GPUのテクスチャの最大サイズを超えるオフスクリーンは作成できない
+    max_size = gpu.capabilities.max_texture_size_get()
+    return max(border_rect.w, border_rect.h) > max_size
+
+
+def _iter_border_bands_gpu(
+    border_rect,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    offscreen_pool: OffscreenPool,
+    tile_size,
+):
+    # 枠線画像を上から順に、tile_size行ずつ(下の行から並んだ配列で)返す
+    #   横方向もtile_sizeごとのタイルに分け、シェーダーにはタイルの位置を渡す
+    w, h = border_rect.w, border_rect.h
+    for y0 in reversed(range(0, h, tile_size)):
+        y1 = min(y0 + tile_size, h)
+        band = np.empty((y1 - y0, w, 4), dtype=np.uint8)
+        for x0 in range(0, w, tile_size):
+            x1 = min(x0 + tile_size, w)
+            tile = (x0, y0, x1 - x0, y1 - y0)
+            with _bind_offscreen(offscreen_pool, x1 - x0, y1 - y0) as fb:
+                with stats.stage(stats.STAGE_RENDER):
+                    if shape_type == shader_utils.SHAPE_TYPE_RECTANGLE:
+                        shader_utils.draw_rounded_rectagle_border(
+                            border_rect, border_color, border_size, corner_radius, tile
+                        )
+                    else:
+                        shader_utils.draw_ellipse_border(
+                            border_rect, border_color, border_size, tile
+                        )
+                    _sync_gpu_for_stats(fb)
+                with stats.stage(stats.STAGE_READBACK):
+                    buffer = fb.read_color(0, 0, x1 - x0, y1 - y0, 4, 0, "UBYTE")
+            buffer.dimensions = (x1 - x0) * (y1 - y0) * 4
+            band[:, x0:x1] = ubyte_buffer_view(buffer).reshape(y1 - y0, x1 - x0, 4)
+        yield band
+
+
+def iter_border_rows(
+    strip_rect,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    render_backend=RENDER_BACKEND_GPU,
+    offscreen_pool: OffscreenPool = None,
+    tile_size=TILE_SIZE,
+):
+    """Yields the rows of a border image from the top row down, tile by tile.
+
+    At most one band of ``tile_size`` rows is held in memory at a time.
+    """
+    border_rect = get_border_rect(strip_rect, border_size)
+    if render_backend == RENDER_BACKEND_CPU:
+        bands = (
+            tile
+            for _, tile in cpu_render.iter_border_tiles(
+                border_rect.w,
+                border_rect.h,
+                shape_type,
+                border_size,
+                border_color,
+                corner_radius,
+                tile_rows=tile_size,
+                reverse=True,
+            )
+        )
+    else:
+        pool = offscreen_pool if offscreen_pool else OffscreenPool()
+        bands = _iter_border_bands_gpu(
+            border_rect,
+            shape_type,
+            border_size,
+            border_color,
+            corner_radius,
+            pool,
+            tile_size,
+        )
+    try:
+        for band in bands:
+            # PNGは上の行から書き出すため、下の行から並んだ行を反転する
+            yield from band[::-1]
+    finally:
+        if render_backend != RENDER_BACKEND_CPU and not offscreen_pool:
+            pool.free()
+    stats.count(stats.COUNTER_BORDERS_RENDERED)
+
+
+def get_border_palette(border_color):
+    # 枠線画像に含まれる色(透明と枠線の色)
+    return [(0, 0, 0, 0), tuple(cpu_render.to_ubyte_color(border_color))]
+
+
+def create_border_image(
+    output_path,
+    strip_rect,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    offscreen_pool: OffscreenPool = None,
+    compress_level=png_utils.DEFAULT_COMPRESS_LEVEL,
+    render_backend=RENDER_BACKEND_GPU,
+    png_mode=png_utils.PNG_MODE_RGBA,
+):
+    border_rect = get_border_rect(strip_rect, border_size)
+    render_backend = resolve_render_backend(render_backend, shape_type)
+    if needs_tiled_render(border_rect, render_backend):
+        # 大きい枠線は、タイルごとに描画した行をそのままPNGに書き出す
+        rows = iter_border_rows(
+            strip_rect,
+            shape_type,
+            border_size,
+            border_color,
+            corner_radius,
+            render_backend=render_backend,
+            offscreen_pool=offscreen_pool,
+        )
+        write_border_png_rows(
+            output_path,
+            rows,
+            border_rect.w,
+            border_rect.h,
+            compress_level,
+            png_mode,
+            get_border_palette(border_color),
+        )
+    else:
+        if render_backend == RENDER_BACKEND_CPU:
+            pixels = render_border_pixels_cpu(
+                strip_rect, shape_type, border_size, border_color, corner_radius
+            )
+        else:
+            pixels = render_border_pixels(
+                strip_rect,
+                shape_type,
+                border_size,
+                border_color,
+                corner_radius,
+                offscreen_pool=offscreen_pool,
+            )
+        write_border_png(
+            output_path, pixels, border_rect.w, border_rect.h, compress_level, png_mode
+        )
+
+
+def write_border_png(
+    output_path, pixels, w, h, compress_level, png_mode=png_utils.PNG_MODE_RGBA
+):
+    with stats.stage(stats.STAGE_PNG_SAVE):
+        png_utils.write_png_mode(output_path, pixels, w, h, compress_level, png_mode)
+    stats.count(stats.COUNTER_BYTES_WRITTEN, os.path.getsize(output_path))
+
+
+def write_border_png_rows(output_path, rows, w, h, compress_level, png_mode, palette):
+    # 描画と書き込みを交互に行うため、PNGの保存時間に描画時間は含めない
+    png_utils.write_png_rows(
+        output_path, rows, w, h, compress_level, png_mode, palette=palette
+    )
+    stats.count(stats.COUNTER_BYTES_WRITTEN, os.path.getsize(output_path))
+
+
+DEFAULT_WRITER_THREADS = min(4, os.cpu_count() or 1)
+
+
+class BorderImageWriter:
+    """Encodes and writes border PNGs on a bounded thread pool."""
+
+    def __init__(self, max_workers=DEFAULT_WRITER_THREADS, max_pending=None):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="borderman_png"
+        )
+        # 書き込み待ちの上限(読み出し済みピクセルを保持し続けないため)
+        self.max_pending = max_pending if max_pending else max_workers * 2
+        # 出力パス -> Future (回収されるまで保持する)
+        self._futures = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def submit(
+        self,
+        output_path,
+        pixels,
+        w,
+        h,
+        compress_level,
+        png_mode=png_utils.PNG_MODE_RGBA,
+    ):
+        # 書き込み中のジョブが上限に達している場合は、空きが出るまで待つ
+        while True:
+            not_done = [f for f in self._futures.values() if not f.done()]
+            if len(not_done) < self.max_pending:
+                break
+            concurrent.futures.wait(
+                not_done, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+        self._futures[output_path] = self._executor.submit(
+            write_border_png, output_path, pixels, w, h, compress_level, png_mode
+        )
+
+    def pop_completed(self, wait=False):
+        if wait:
+            concurrent.futures.wait(self._futures.values())
+        completed = [path for path, f in self._futures.items() if f.done()]
+        for path in completed:
+            # 書き込みに失敗した場合は例外を再送出する
+            self._futures.pop(path).result()
+        return completed
+
+    def shutdown(self, cancel=False):
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+        self._futures.clear()
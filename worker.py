@@ -0,0 +1,169 @@
+# 枠線画像の作成を`blender --background`のワーカープロセスで行う
+#   編集中のBlenderでは描画とPNGの書き込みを行わず、依頼と結果の受け取りのみを行う
+#   依頼と結果は標準入出力で1行ずつのJSONとしてやり取りする
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+from . import cli
+from . import utils
+
+RESULT_PREFIX = "BORDERMAN_WORKER_RESULT "
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# ワーカーごとの処理中の依頼の上限
+#   上限を超えて送るとパイプへの書き込みで依頼元が止まるため、完了を待ってから送る
+MAX_PENDING_PER_WORKER = 2
+
+
+def make_request(
+    plan,
+    shape_type,
+    border_size,
+    border_color,
+    corner_radius,
+    compress_level,
+    png_mode,
+    render_backend,
+):
+    # プロキシの場合は縮小した領域を描画する
+    rect = plan.render_rect
+    return {
+        "output_path": plan.output_path,
+        "rect": [rect.x, rect.y, rect.w, rect.h],
+        "shape_type": shape_type,
+        "border_size": border_size,
+        "border_color": list(border_color),
+        "corner_radius": corner_radius,
+        "compress_level": compress_level,
+        "png_mode": png_mode,
+        "render_backend": render_backend,
+    }
+
+
+class WorkerPool:
+    """Sends border render requests to ``blender --background`` worker processes."""
+
+    def __init__(self, blender, num_workers=DEFAULT_WORKERS):
+        self._results = queue.Queue()
+        self._procs = []
+        # ワーカーごとの処理中の依頼の数
+        self._loads = []
+        # 処理中の出力パス -> ワーカーの番号
+        self._pending = {}
+        try:
+            for index in range(num_workers):
+                proc = subprocess.Popen(
+                    cli.blender_command(blender, None, [], module="worker"),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    encoding="utf-8",
+                    bufsize=1,
+                )
+                self._procs.append(proc)
+                self._loads.append(0)
+                threading.Thread(
+                    target=self._read_results,
+                    args=(index, proc),
+                    name=f"borderman_worker_{index}",
+                    daemon=True,
+                ).start()
+        except Exception:
+            self.shutdown(cancel=True)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel=exc_type is not None)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _read_results(self, index, proc):
+        # Blender自体の出力も標準出力に流れるため、結果の行のみを取り出す
+        for line in proc.stdout:
+            if line.startswith(RESULT_PREFIX):
+                self._results.put(json.loads(line[len(RESULT_PREFIX) :]))
+        self._results.put({"worker": index, "exited": True})
+
+    def is_full(self):
+        return all(load >= MAX_PENDING_PER_WORKER for load in self._loads)
+
+    def submit(self, request):
+        # 処理中の依頼が最も少ないワーカーに送る
+        index = min(range(len(self._procs)), key=lambda i: self._loads[i])
+        proc = self._procs[index]
+        proc.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+        proc.stdin.flush()
+        self._loads[index] += 1
+        self._pending[request["output_path"]] = index
+
+    def pop_completed(self, wait=False):
+        completed = []
+        while self._pending:
+            try:
+                result = self._results.get(block=wait)
+            except queue.Empty:
+                break
+            if result.get("exited"):
+                if result["worker"] in self._pending.values():
+                    raise RuntimeError(
+                        f"border worker {result['worker']} exited unexpectedly"
+                    )
+                continue
+            output_path = result["output_path"]
+            self._loads[self._pending.pop(output_path)] -= 1
+            if not result["ok"]:
+                raise RuntimeError(f"{output_path}: {result['error']}")
+            completed.append(output_path)
+        return completed
+
+    def shutdown(self, cancel=False):
+        # 標準入力を閉じると、ワーカーは処理中の依頼を終えてから終了する
+        for proc in self._procs:
+            if cancel:
+                proc.kill()
+            elif proc.stdin:
+                proc.stdin.close()
+        for proc in self._procs:
+            proc.wait()
+        self._procs.clear()
+        self._pending.clear()
+
+
+def handle_request(request, offscreen_pool):
+    utils.create_border_image(
+        request["output_path"],
+        utils.Rect(*request["rect"]),
+        request["shape_type"],
+        request["border_size"],
+        tuple(request["border_color"]),
+        request["corner_radius"],
+        offscreen_pool=offscreen_pool,
+        compress_level=request["compress_level"],
+        render_backend=request["render_backend"],
+        png_mode=request["png_mode"],
+    )
+
+
+def main():
+    # ワーカープロセス側: 標準入力が閉じられるまで依頼を処理する
+    with utils.OffscreenPool() as offscreen_pool:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            result = {"output_path": request["output_path"], "ok": True}
+            try:
+                handle_request(request, offscreen_pool)
+            except Exception as e:
+                result.update(ok=False, error=f"{type(e).__name__}: {e}")
+            sys.stdout.write(RESULT_PREFIX + json.dumps(result, ensure_ascii=False))
+            sys.stdout.write("\n")
+            sys.stdout.flush()